@@ -1,12 +1,16 @@
 # Create game of connect 4
-import numpy as np
 import random
 import math
 import time
 import os
 import sys
 import copy
-import pygame
+
+import connect4_engine as engine
+from connect4_engine import evaluate, search
+from connect4_engine.book import load_book
+from connect4_engine.endgame import ENDGAME_CELLS
+from connect4_engine.tt import TranspositionTable
 
 
 
@@ -25,21 +29,30 @@ BLACK = (0, 0, 0)
 WHITE = (255, 255, 255)
 # Game settings
 FPS = 60
-# Initialize pygame
-pygame.init()
-# Set up the display
+TABLE_BYTES = 64 * 1024 * 1024  # Memory cap for the AI's transposition table
+table = None  # Created on the first AI search
+book = None  # None until the opening book has been generated
 WINDOW_SIZE = (700, 600)
-screen = pygame.display.set_mode(WINDOW_SIZE)
-pygame.display.set_caption("Connect 4")
+# pygame and the window are only set up by init_display, so importing this
+# module opens no window
+pygame = None
+screen = None
+# Initialize pygame and set up the display
+def init_display():
+    global pygame, screen
+    import pygame
+    pygame.init()
+    screen = pygame.display.set_mode(WINDOW_SIZE)
+    pygame.display.set_caption("Connect 4")
 # Draw the board  
 def draw_board(board):
     screen.fill(BLUE)  # Fill the background with blue
     for c in range(COLS):
         for r in range(ROWS):
             pygame.draw.circle(screen, BLACK, (c * 100 + 50, r * 100 + 150), 40)  # Draw empty slots
-            if board[r][c] == PLAYER1:
+            if board[ROWS - 1 - r][c] == PLAYER1:
                 pygame.draw.circle(screen, RED, (c * 100 + 50, r * 100 + 150), 40)  # Draw Player 1 pieces
-            elif board[r][c] == PLAYER2:
+            elif board[ROWS - 1 - r][c] == PLAYER2:
                 pygame.draw.circle(screen, YELLOW, (c * 100 + 50, r * 100 + 150), 40)  # Draw Player 2 pieces
     pygame.display.update()
 # Draw the game over screen
@@ -56,125 +69,44 @@ def draw_game_over(winner):
     time.sleep(3)
 # Check for a win
 def winning_move(board, row, col, piece):
-    # Check horizontal
-    for c in range(COLS - 3):
-        if board[row][c] == piece and board[row][c + 1] == piece and board[row][c + 2] == piece and board[row][c + 3] == piece:
-            return True
-    # Check vertical
-    for r in range(ROWS - 3):
-        if board[r][col] == piece and board[r + 1][col] == piece and board[r + 2][col] == piece and board[r + 3][col] == piece:
-            return True
-    # Check diagonal (positive slope)
-    for r in range(ROWS - 3):
-        for c in range(COLS - 3):
-            if board[r][c] == piece and board[r + 1][c + 1] == piece and board[r + 2][c + 2] == piece and board[r + 3][c + 3] == piece:
-                return True
-    # Check diagonal (negative slope)
-    for r in range(3, ROWS):
-        for c in range(COLS - 3):
-            if board[r][c] == piece and board[r - 1][c + 1] == piece and board[r - 2][c + 2] == piece and board[r - 3][c + 3] == piece:
-                return True
-    return False
+    return engine.winning_move(board, piece)[0]
 # Check for a tie
 def is_tie(board):
-    for c in range(COLS):
-        if board[0][c] == EMPTY:
-            return False
-    return True
+    return board.is_full()
 # Get the valid moves
 def get_valid_moves(board):
-    valid_moves = []
-    for c in range(COLS):
-        if board[0][c] == EMPTY:
-            valid_moves.append(c)
-    return valid_moves
-# Get the next open row
+    return board.valid_moves()
+# Get the next open row (counted from the top, as drawn on screen)
 def get_next_open_row(board, col):
-    for r in range(ROWS - 1, -1, -1):
-        if board[r][col] == EMPTY:
-            return r
+    if board.can_play(col):
+        return ROWS - 1 - board.heights[col]
 # Get the score of the board
 def score_position(board, piece):
-    score = 0
-    # Score center column
-    center_array = [int(i) for i in list(board[:, COLS // 2])]
-    center_count = center_array.count(piece)
-    score += center_count * 3
-    # Score horizontal
-    for r in range(ROWS):
-        row_array = [int(i) for i in list(board[r])]
-        for c in range(COLS - 3):
-            window = row_array[c:c + WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-    # Score vertical
-    for c in range(COLS):
-        col_array = [int(i) for i in list(board[:, c])]
-        for r in range(ROWS - 3):
-            window = col_array[r:r + WINDOW_LENGTH]
-            score += evaluate_window(window, piece)
-    # Score diagonal (positive slope)
-    for r in range(ROWS - 3):
-        for c in range(COLS - 3):
-            window = [board[r + i][c + i] for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window, piece)
-    # Score diagonal (negative slope)
-    for r in range(3, ROWS):
-        for c in range(COLS - 3):
-            window = [board[r - i][c + i] for i in range(WINDOW_LENGTH)]
-            score += evaluate_window(window, piece)
-    return score
+    return evaluate.score_position(board, piece)
 # Evaluate the window
 def evaluate_window(window, piece):
-    score = 0
-    opp_piece = PLAYER1 if piece == PLAYER2 else PLAYER2
-    if window.count(piece) == 4:
-        score += 100
-    elif window.count(piece) == 3 and window.count(EMPTY) == 1:
-        score += 5
-    elif window.count(piece) == 2 and window.count(EMPTY) == 2:
-        score += 2
-    if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
-        score -= 4
-    return score
-# Minimax algorithm
+    return evaluate.evaluate_window(window, piece)
+# Minimax algorithm, searched by the engine with a transposition table shared across moves.
+# Book positions are answered from the opening book, with the value on the search's scale:
+# a solved win or loss is WIN_SCORE plus the book's score, and a move the book did not
+# solve gets the heuristic score of the position.
 def minimax(board, depth, alpha, beta, maximizing_player):
-    valid_moves = get_valid_moves(board)
-    is_terminal = False
-    if depth == 0 or is_tie(board) or len(valid_moves) == 0:
-        return score_position(board, PLAYER1), None
-    if maximizing_player:
-        value = -math.inf
-        column = random.choice(valid_moves)
-        for col in valid_moves:
-            row = get_next_open_row(board, col)
-            temp_board = board.copy()
-            temp_board[row][col] = PLAYER1
-            new_score = minimax(temp_board, depth - 1, alpha, beta, False)[0]
-            if new_score > value:
-                value = new_score
-                column = col
-            alpha = max(alpha, value)
-            if beta <= alpha:
-                break
-        return value, column
-    else:
-        value = math.inf
-        column = random.choice(valid_moves)
-        for col in valid_moves:
-            row = get_next_open_row(board, col)
-            temp_board = board.copy()
-            temp_board[row][col] = PLAYER2
-            new_score = minimax(temp_board, depth - 1, alpha, beta, True)[0]
-            if new_score < value:
-                value = new_score
-                column = col
-            beta = min(beta, value)
-            if beta <= alpha:
-                break
-        return value, column
+    global table, book
+    if table is None:
+        table = TranspositionTable(TABLE_BYTES)
+        book = load_book()
+    hit = book.lookup(board) if book is not None else None
+    if hit is not None:
+        value, col, exact = hit
+        if not exact:
+            return score_position(board, PLAYER1), col
+        if value:
+            value += search.WIN_SCORE if value > 0 else -search.WIN_SCORE
+        return (value if board.side == PLAYER1 else -value), col
+    return search.minimax(board, depth, alpha, beta, maximizing_player, PLAYER1, table, endgame_cells=ENDGAME_CELLS)
 # Play the game
 def play_game():
-    board = np.zeros((ROWS, COLS))  # Initialize the game board
+    board = engine.create_board()  # Initialize the game board
     game_over = False
     turn = random.randint(PLAYER1, PLAYER2)  # Randomly choose who starts
     draw_board(board)  # Draw the initial empty board
@@ -204,9 +136,9 @@ def play_game():
                     posx = event.pos[0]
                     col = int(posx // 100)  # Determine the column based on mouse position
 
-                    if board[0][col] == EMPTY:  # Check if the column is valid
+                    if engine.is_valid_location(board, col):  # Check if the column is valid
                         row = get_next_open_row(board, col)
-                        board[row][col] = PLAYER1  # Drop the piece
+                        engine.drop_piece(board, row, col, PLAYER1)  # Drop the piece
                         draw_board(board)  # Update the board display
 
                         if winning_move(board, row, col, PLAYER1):  # Check for a win
@@ -217,9 +149,9 @@ def play_game():
                 else:
                     col = random.choice(get_valid_moves(board))  # AI chooses a random valid column
 
-                    if board[0][col] == EMPTY:  # Check if the column is valid
+                    if engine.is_valid_location(board, col):  # Check if the column is valid
                         row = get_next_open_row(board, col)
-                        board[row][col] = PLAYER2  # Drop the piece
+                        engine.drop_piece(board, row, col, PLAYER2)  # Drop the piece
                         draw_board(board)  # Update the board display
 
                         if winning_move(board, row, col, PLAYER2):  # Check for a win
@@ -236,6 +168,7 @@ def play_game():
                 turn = (turn + 1) % 2
 # Main function
 if __name__ == "__main__":
+    init_display()
     play_game()
     pygame.quit()
     sys.exit()
@@ -0,0 +1,49 @@
+# Headless connect 4 engine shared by connect4.py and connect4_final.py
+#
+# Importing the package loads neither pygame nor numpy, and the parts that
+# need process pools, threads or the profiler are only imported when first
+# used, so worker processes start in a few milliseconds.
+import importlib
+
+from .bitboard import (
+    ROWS,
+    COLS,
+    CONNECT,
+    EMPTY,
+    PLAYER1,
+    PLAYER2,
+    STANDARD,
+    Variant,
+    get_variant,
+    parse_variant,
+    Position,
+    position_from_moves,
+    create_board,
+    drop_piece,
+    is_valid_location,
+    get_next_open_row,
+    get_valid_moves,
+    is_tie,
+    winning_move,
+)
+from .evaluate import DEFAULT_WEIGHTS, IncrementalEvaluator, Weights, load_weights, score_position
+from .search import SearchCancelled, minimax
+from .tt import TranspositionTable
+from .solver import Solver, solve
+
+# Names imported from their module on first use
+_LAZY = {
+    "ParallelSearch": "parallel",
+    "SearchStats": "stats",
+    "profile_search": "stats",
+    "AIWorker": "worker",
+    "Ponderer": "ponder",
+}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module("." + _LAZY[name], __name__), name)
+    globals()[name] = value
+    return value
@@ -0,0 +1,191 @@
+# Bulk replay and blunder analysis of game records
+#
+# Every position of every game is re-evaluated by an engine, and a move is
+# flagged as a blunder when the engine proves it throws away a win or a draw
+# (for minimax, a forced result within its depth). Games stream through a
+# process pool in chunks, with only a few chunks in flight at a time, and the
+# results come out as JSON lines in the order of the input:
+#
+#   python -m connect4_engine.analysis games.txt.gz --engine minimax:6 --workers 8 > analysis.jsonl
+#   python -m connect4_engine.analysis games.txt --engine solver:20 --blunders-only
+import argparse
+import functools
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from .arena import parse_spec
+from .bitboard import STANDARD
+from .records import RESULT_CHARS, read_records
+from .search import WIN_SCORE, minimax
+from .solver import Solver, win_score
+from .tt import TranspositionTable
+
+# Memory cap of the transposition table of each engine
+ENGINE_TABLE_BYTES = 16 * 1024 * 1024
+# Depth of minimax when the spec gives none
+DEFAULT_DEPTH = 6
+
+
+class MinimaxEngine:
+    def __init__(self, depth):
+        self.depth = depth
+        self.table = TranspositionTable(ENGINE_TABLE_BYTES)
+
+    # Value for the player to move and the best move
+    def evaluate(self, board):
+        return minimax(board, self.depth, -math.inf, math.inf, True, board.side, self.table)
+
+    # Value for the player to move of playing a column
+    def move_value(self, board, col):
+        piece = board.side
+        board.play(col)
+        value = minimax(board, self.depth - 1, -math.inf, math.inf, False, piece, self.table)[0]
+        board.undo()
+        return value
+
+    # 1 for a forced win, -1 for a forced loss, 0 when the value is heuristic
+    def outcome(self, value):
+        if value >= WIN_SCORE:
+            return 1
+        if value <= -WIN_SCORE:
+            return -1
+        return 0
+
+
+class SolverEngine:
+    # time_ms None solves every position exactly
+    def __init__(self, time_ms=None):
+        self.time_ms = time_ms
+        self.table = TranspositionTable(ENGINE_TABLE_BYTES)
+        self.solver = Solver(self.table)
+
+    def evaluate(self, board):
+        value, col, exact = self.solver.best_move(board, self.time_ms)
+        return value, col
+
+    def move_value(self, board, col):
+        if board.is_winning_move(col):
+            return win_score(board)
+        board.play(col)
+        value = 0 if board.is_full() else -self.solver.best_move(board, self.time_ms)[0]
+        board.undo()
+        return value
+
+    # Exact values are whole scores; heuristic ones lie strictly between -1 and 1
+    def outcome(self, value):
+        if value >= 1:
+            return 1
+        if value <= -1:
+            return -1
+        return 0
+
+
+# Engine for a spec such as "minimax:6", "solver:20" or "solver" (exact),
+# built once per spec and variant in each process
+@functools.lru_cache(maxsize=None)
+def make_engine(spec, variant):
+    name, value, weights_path = parse_spec(spec, depth=DEFAULT_DEPTH, time_ms=None)
+    if name == "minimax" and not weights_path:
+        return MinimaxEngine(value)
+    if name == "solver":
+        return SolverEngine(value)
+    raise ValueError("unknown engine %r" % spec)
+
+
+# Analyze one game; blunders are listed with 1-based plies and columns
+def analyze_record(record, engine):
+    # Fresh tables keep the results independent of the games analyzed before
+    engine.table.clear()
+    blunders = []
+    positions = 0
+    for board, col in record.positions():
+        positions += 1
+        value, best = engine.evaluate(board)
+        if col == best:
+            continue
+        played = engine.move_value(board, col)
+        if engine.outcome(played) < engine.outcome(value):
+            blunders.append({"ply": board.moves + 1, "side": board.side, "move": col + 1,
+                             "best": None if best is None else best + 1,
+                             "value": value, "played_value": played})
+    return {"moves": record.move_string(), "result": RESULT_CHARS[record.result], "positions": positions,
+            "blunders": blunders}
+
+
+# Analyze a chunk of games in a worker; games that do not replay get an error
+def analyze_chunk(spec, records, first_index):
+    results = []
+    for index, record in enumerate(records, first_index):
+        try:
+            result = analyze_record(record, make_engine(spec, record.variant))
+        except ValueError as e:
+            result = {"moves": record.move_string(), "error": str(e)}
+        result["game"] = index
+        results.append(result)
+    return results
+
+
+# Analyze a stream of records, yielding results in input order. With more
+# than one worker (None for the CPU count), at most two chunks per worker are
+# queued at a time, so memory use does not grow with the number of games.
+def analyze_records(records, spec, workers=1, chunk_size=64):
+    if workers is None:
+        workers = os.cpu_count()
+    records = iter(records)
+    chunks = ((start, list(itertools.islice(records, chunk_size))) for start in itertools.count(0, chunk_size))
+    chunks = itertools.takewhile(lambda chunk: chunk[1], chunks)
+    if workers == 1:
+        for start, chunk in chunks:
+            yield from analyze_chunk(spec, chunk, start)
+        return
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for start, chunk in chunks:
+            pending.append(executor.submit(analyze_chunk, spec, chunk, start))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay connect 4 game records and flag blunders.")
+    parser.add_argument("records", help="record file, .gz for gzip, - for stdin")
+    parser.add_argument("--engine", default="minimax:6", help="minimax:DEPTH, solver:MS or solver (exact)")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (0 for the CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="games sent to a worker at a time")
+    parser.add_argument("--output", default="-", help="JSON lines output file (default stdout)")
+    parser.add_argument("--blunders-only", action="store_true", help="only write games with blunders or errors")
+    args = parser.parse_args(argv)
+    try:
+        make_engine(args.engine, STANDARD)
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w")
+    games = positions = blunders = errors = 0
+    start = time.perf_counter()
+    try:
+        for result in analyze_records(read_records(args.records), args.engine, args.workers or None, args.chunk_size):
+            games += 1
+            positions += result.get("positions", 0)
+            blunders += len(result.get("blunders", ()))
+            errors += "error" in result
+            if not args.blunders_only or result.get("blunders") or "error" in result:
+                out.write(json.dumps(result) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - start
+    print("%d games, %d positions, %d blunders, %d errors in %.1f s (%.0f positions/s)" % (
+        games, positions, blunders, errors, seconds, positions / seconds if seconds else 0.0), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# Headless self-play arena and round-robin tournament runner
+#
+# Agents are given as specs on the command line:
+#   random          uniformly random legal moves
+#   minimax:DEPTH   heuristic minimax to a fixed depth
+#   timed:MS        heuristic minimax deepened for MS milliseconds per move
+#   solver:MS       solver with a time budget of MS milliseconds per move
+#
+# minimax and timed agents take an evaluation weights file written by the
+# tuner as a last field, e.g. minimax:4:weights.json.
+#
+# Example:
+#   python -m connect4_engine.arena random minimax:4 solver:50 --games 200 --workers 8
+#   python -m connect4_engine.arena minimax:4 solver:50 --variant 7x8x4
+#   python -m connect4_engine.arena minimax:4 minimax:4:weights.json --games 400
+import argparse
+import itertools
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .bitboard import STANDARD, Position, parse_variant
+from .evaluate import DEFAULT_WEIGHTS, load_weights
+from .search import minimax
+from .solver import Solver
+from .timed import timed_minimax
+from .tt import TranspositionTable
+
+# Memory cap of the transposition table of each search agent
+AGENT_TABLE_BYTES = 16 * 1024 * 1024
+# Depth of minimax and budget of timed and solver when a spec gives none
+DEFAULT_DEPTH = 4
+DEFAULT_MS = 100
+
+
+class RandomAgent:
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def choose(self, board):
+        return self.rng.choice(board.valid_moves())
+
+
+# endgame_cells is passed on to minimax, so the agent can solve late positions
+class MinimaxAgent:
+    def __init__(self, depth, weights=DEFAULT_WEIGHTS, endgame_cells=0):
+        self.depth = depth
+        self.weights = weights
+        self.endgame_cells = endgame_cells
+        self.table = TranspositionTable(AGENT_TABLE_BYTES)
+
+    def choose(self, board):
+        return minimax(board, self.depth, -math.inf, math.inf, True, board.side, self.table, weights=self.weights,
+                       endgame_cells=self.endgame_cells)[1]
+
+
+class TimedAgent:
+    def __init__(self, time_ms, weights=DEFAULT_WEIGHTS):
+        self.time_ms = time_ms
+        self.weights = weights
+        self.table = TranspositionTable(AGENT_TABLE_BYTES)
+
+    def choose(self, board):
+        return timed_minimax(board, self.time_ms, board.side, self.table, weights=self.weights)[1]
+
+
+class SolverAgent:
+    def __init__(self, time_ms):
+        self.time_ms = time_ms
+        self.solver = Solver(TranspositionTable(AGENT_TABLE_BYTES))
+
+    def choose(self, board):
+        return self.solver.best_move(board, self.time_ms)[1]
+
+
+# Split an agent spec into (name, depth or budget, weights path). Specs that
+# give no number get the depth or time_ms passed in; the weights path is ""
+# when there is none. This is the one parser of the spec grammar, shared by
+# the arena, the server and the analysis: it raises ValueError for an unknown
+# agent, a depth below 1 or a budget that is not a positive number.
+def parse_spec(spec, depth=DEFAULT_DEPTH, time_ms=DEFAULT_MS):
+    name, _, arg = spec.partition(":")
+    arg, _, weights_path = arg.partition(":")
+    try:
+        if name == "random" and not arg and not weights_path:
+            return name, None, ""
+        if name == "minimax":
+            value = int(arg) if arg else depth
+            if value >= 1:
+                return name, value, weights_path
+        if name in ("timed", "solver") and not (name == "solver" and weights_path):
+            value = float(arg) if arg else time_ms
+            if value is None or 0 < value < math.inf:
+                return name, value, weights_path
+    except ValueError:
+        pass
+    raise ValueError("unknown agent %r" % spec)
+
+
+# Build an agent from a spec such as "minimax:4"
+def make_agent(spec, seed=None, endgame_cells=0):
+    name, value, weights_path = parse_spec(spec)
+    if name == "random":
+        return RandomAgent(seed)
+    if name == "solver":
+        return SolverAgent(value)
+    weights = load_weights(weights_path) if weights_path else DEFAULT_WEIGHTS
+    if name == "minimax":
+        return MinimaxAgent(value, weights, endgame_cells)
+    return TimedAgent(value, weights)
+
+
+# Play one game; returns (winning agent index or None, moves, think time per agent, moves per agent)
+def play_game(agents, opening_plies=0, rng=None, variant=STANDARD):
+    board = Position(variant)
+    think = [0.0, 0.0]
+    counts = [0, 0]
+    for _ in range(opening_plies):
+        col = (rng or random).choice(board.valid_moves())
+        if board.is_winning_move(col):
+            break
+        board.play(col)
+    while not board.is_full():
+        turn = board.moves % 2
+        start = time.perf_counter()
+        col = agents[turn].choose(board)
+        think[turn] += time.perf_counter() - start
+        counts[turn] += 1
+        board.play(col)
+        if board.last_move_won():
+            return turn, board.history[:], think, counts
+    return None, board.history[:], think, counts
+
+
+# Play a batch of games between two agent specs in one process. Even games
+# give spec_a the first move, odd games give it to spec_b.
+def play_games(spec_a, spec_b, game_ids, seed, opening_plies, variant=STANDARD):
+    agents = (make_agent(spec_a, seed), make_agent(spec_b, seed + 1))
+    results = []
+    for game_id in game_ids:
+        rng = random.Random(seed * 1000003 + game_id)
+        a_first = game_id % 2 == 0
+        order = agents if a_first else agents[::-1]
+        winner, moves, think, counts = play_game(order, opening_plies, rng, variant)
+        if not a_first:
+            think = think[::-1]
+            counts = counts[::-1]
+            if winner is not None:
+                winner = 1 - winner
+        results.append({"winner": winner, "a_first": a_first, "moves": len(moves),
+                        "think": think, "counts": counts})
+    return results
+
+
+# Win/draw/loss counts and average move latency for one pairing
+def summarize(spec_a, spec_b, results):
+    wins = sum(r["winner"] == 0 for r in results)
+    losses = sum(r["winner"] == 1 for r in results)
+    draws = len(results) - wins - losses
+    think = [sum(r["think"][i] for r in results) for i in range(2)]
+    counts = [sum(r["counts"][i] for r in results) for i in range(2)]
+    return {
+        "a": spec_a,
+        "b": spec_b,
+        "games": len(results),
+        "wins": wins,
+        "draws": draws,
+        "losses": losses,
+        "elo_diff": elo_difference(wins, draws, losses),
+        "a_ms_per_move": 1000 * think[0] / counts[0] if counts[0] else 0.0,
+        "b_ms_per_move": 1000 * think[1] / counts[1] if counts[1] else 0.0,
+    }
+
+
+# Elo difference of a over b implied by a match score, with half a draw
+# added to each side so that clean sweeps stay finite
+def elo_difference(wins, draws, losses):
+    score = (wins + (draws + 1) / 2) / (wins + draws + losses + 1)
+    return -400 * math.log10(1 / score - 1)
+
+
+# Fit Elo ratings (mean 1500) to round-robin results with the Bradley-Terry model
+def fit_ratings(specs, pairings, iterations=200):
+    strength = {spec: 1.0 for spec in specs}
+    for _ in range(iterations):
+        updated = {}
+        for spec in specs:
+            points = 0.0
+            expected = 0.0
+            for p in pairings:
+                if spec not in (p["a"], p["b"]):
+                    continue
+                other = p["b"] if spec == p["a"] else p["a"]
+                own_wins = p["wins"] if spec == p["a"] else p["losses"]
+                games = p["games"] + 1
+                points += own_wins + (p["draws"] + 1) / 2
+                expected += games / (strength[spec] + strength[other])
+            updated[spec] = points / expected if expected else strength[spec]
+        strength = updated
+    logs = {spec: 400 * math.log10(value) for spec, value in strength.items()}
+    mean = sum(logs.values()) / len(logs)
+    return {spec: 1500 + value - mean for spec, value in logs.items()}
+
+
+# Play every pair of specs against each other across a process pool
+def run_tournament(specs, games=100, workers=None, seed=0, opening_plies=2, chunk_size=10, variant=STANDARD):
+    pairings = []
+    with ProcessPoolExecutor(workers) as executor:
+        for spec_a, spec_b in itertools.combinations(specs, 2):
+            futures = [executor.submit(play_games, spec_a, spec_b, range(start, min(start + chunk_size, games)),
+                                       seed + start, opening_plies, variant)
+                       for start in range(0, games, chunk_size)]
+            results = [result for future in futures for result in future.result()]
+            pairings.append(summarize(spec_a, spec_b, results))
+    return {"pairings": pairings, "ratings": fit_ratings(specs, pairings)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Play connect 4 agents against each other without a display.")
+    parser.add_argument("agents", nargs="+", help="agent specs: random, minimax:DEPTH, timed:MS, solver:MS")
+    parser.add_argument("--games", type=int, default=100, help="games per pairing")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--opening-plies", type=int, default=2, help="random moves played before the agents take over")
+    parser.add_argument("--variant", type=parse_variant, default=STANDARD,
+                        help="board as ROWSxCOLS or ROWSxCOLSxCONNECT (default 6x7x4)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+    if len(args.agents) == 1:
+        args.agents.append("random")
+    for spec in args.agents:
+        try:
+            parse_spec(spec)
+        except ValueError as e:
+            parser.error(str(e))
+
+    start = time.perf_counter()
+    report = run_tournament(args.agents, args.games, args.workers, args.seed, args.opening_plies,
+                            variant=args.variant)
+    report["seconds"] = time.perf_counter() - start
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for p in report["pairings"]:
+        print("%-14s vs %-14s  +%d =%d -%d  elo %+.0f  ms/move %.2f / %.2f" % (
+            p["a"], p["b"], p["wins"], p["draws"], p["losses"], p["elo_diff"], p["a_ms_per_move"], p["b_ms_per_move"]))
+    for spec, rating in sorted(report["ratings"].items(), key=lambda item: -item[1]):
+        print("%-14s %6.0f" % (spec, rating))
+    print("%.1f s" % report["seconds"])
+
+
+if __name__ == "__main__":
+    main()
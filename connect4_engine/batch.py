@@ -0,0 +1,70 @@
+# Vectorized scoring of many positions at once with NumPy
+#
+# Boards are (N, ROWS, COLS) arrays of EMPTY/PLAYER1/PLAYER2. Each window of
+# four is read as a base-3 code of its cells, and one lookup per window gives
+# the evaluate_window score and whether it is a four in a row. Scoring is the
+# same whichever way up the rows are stored. Only the standard 6x7 board is
+# supported.
+import numpy as np
+
+from .bitboard import ROWS, COLS, PLAYER1, PLAYER2, COLUMN_HEIGHT
+from .evaluate import WINDOWS, WINDOW_LENGTH, WINDOW_SCORES, CENTER_WEIGHT
+
+# Positions scored per chunk, to bound the size of the temporary arrays
+CHUNK_SIZE = 8192
+
+# Flat cell indices of every window, shape (windows, WINDOW_LENGTH)
+WINDOW_INDEX = np.array([[r * COLS + c for r, c in window] for window in WINDOWS], dtype=np.intp)
+CENTER_INDEX = np.array([r * COLS + COLS // 2 for r in range(ROWS)], dtype=np.intp)
+CODE_WEIGHTS = [3 ** i for i in range(WINDOW_LENGTH)]
+
+
+# Score and four-in-a-row flag of every possible window code, for a piece
+def code_tables(piece):
+    other = PLAYER1 + PLAYER2 - piece
+    codes = 3 ** WINDOW_LENGTH
+    scores = np.zeros(codes, dtype=np.int32)
+    fours = np.zeros(codes, dtype=bool)
+    for code in range(codes):
+        cells = [(code // 3 ** i) % 3 for i in range(WINDOW_LENGTH)]
+        own = cells.count(piece)
+        scores[code] = WINDOW_SCORES[own][cells.count(other)]
+        fours[code] = own == WINDOW_LENGTH
+    return scores, fours
+
+
+CODE_TABLES = {PLAYER1: code_tables(PLAYER1), PLAYER2: code_tables(PLAYER2)}
+
+
+# Convert bitboards (stones of each player, in the engine's bit layout) to boards
+def unpack_bitboards(player1, player2):
+    player1 = np.asarray(player1, dtype=np.uint64)
+    player2 = np.asarray(player2, dtype=np.uint64)
+    shifts = np.array([[c * COLUMN_HEIGHT + r for c in range(COLS)] for r in range(ROWS)], dtype=np.uint64)
+    one = np.uint64(1)
+    boards = ((player1[:, None, None] >> shifts) & one).astype(np.int8) * PLAYER1
+    boards += ((player2[:, None, None] >> shifts) & one).astype(np.int8) * PLAYER2
+    return boards
+
+
+# Stack Position objects into an (N, ROWS, COLS) int8 array
+def positions_to_boards(positions):
+    return np.array([position.to_array() for position in positions], dtype=np.int8).reshape(-1, ROWS, COLS)
+
+
+# Score a batch of boards for a piece; returns (scores, wins) where scores
+# matches score_position and wins flags boards where piece has four in a row
+def score_batch(boards, piece=PLAYER1):
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, ROWS * COLS)
+    window_scores, window_fours = CODE_TABLES[piece]
+    scores = np.empty(len(boards), dtype=np.int32)
+    wins = np.empty(len(boards), dtype=bool)
+    for start in range(0, len(boards), CHUNK_SIZE):
+        chunk = boards[start:start + CHUNK_SIZE]
+        codes = np.zeros((len(chunk), len(WINDOW_INDEX)), dtype=np.intp)
+        for i in range(WINDOW_LENGTH):
+            codes += chunk[:, WINDOW_INDEX[:, i]] * CODE_WEIGHTS[i]
+        scores[start:start + CHUNK_SIZE] = window_scores[codes].sum(axis=1) + \
+            (chunk[:, CENTER_INDEX] == piece).sum(axis=1) * CENTER_WEIGHT
+        wins[start:start + CHUNK_SIZE] = window_fours[codes].any(axis=1)
+    return scores, wins
@@ -0,0 +1,253 @@
+# Benchmarks for the engine primitives and the search
+#
+# Runs the bitboard engine and the original NumPy code (reference.py) over
+# fixed sets of positions and prints calls/sec for the primitives, and
+# nodes/sec, time to depth, effective branching factor and peak memory for
+# the search. The search runs without the endgame solver, which is timed on
+# its own on the endgame positions. Time-managed searches are checked
+# against their budgets: the run fails if one overruns by more than
+# --margin-ms. Results can be saved as JSON and compared against an earlier
+# run:
+#
+#   python -m connect4_engine.bench --output before.json
+#   python -m connect4_engine.bench --compare before.json
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+from . import endgame, reference
+from .bitboard import PLAYER1, Position, get_valid_moves, position_from_moves, winning_move
+from .evaluate import score_position
+from .search import minimax
+from .timed import timed_minimax
+from .tt import TranspositionTable
+
+# Fixed positions as 1-based column digits; none of them is already won
+POSITION_SETS = {
+    "opening": ["", "4", "44", "4453", "637512"],
+    "midgame": ["637512326615", "33245353264562", "3624144253722467", "632715234666642652"],
+    "endgame": ["4333654444764553711636526732", "424246526614576327524723646315",
+                "23144512333123643655665656725227", "6266163226126455422533751353577131"],
+}
+# Timed searches also run on positions a few plies before the endgame
+# solver takes over, whose first solves are the hardest to stop in time
+TIMED_SETS = dict(POSITION_SETS, late=["25263474443343433677", "252634744433434336"])
+
+
+# Counts the stones played during a search
+class CountingPosition(Position):
+    def __init__(self, board):
+        board = board.copy()
+        for name in Position.__slots__:
+            setattr(self, name, getattr(board, name))
+        self.plays = 0
+
+    def play(self, col):
+        self.plays += 1
+        Position.play(self, col)
+
+
+# Calls per second of fn over a list of argument tuples
+def rate(fn, calls, min_time):
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        for args in calls:
+            fn(*args)
+        count += len(calls)
+        elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def bench_primitives(min_time):
+    results = {}
+    for name, moves_list in POSITION_SETS.items():
+        boards = [position_from_moves(moves) for moves in moves_list]
+        arrays = [reference.board_from_moves(moves) for moves in moves_list]
+        # The original winning_move scans the row and column of the last move
+        last = []
+        for moves, array in zip(moves_list, arrays):
+            col = int(moves[-1]) - 1 if moves else 0
+            row = next((r for r in range(reference.ROWS) if array[r][col] != 0), reference.ROWS - 1)
+            last.append((row, col))
+        cases = {
+            "winning_move": (
+                (winning_move, [(b, PLAYER1) for b in boards]),
+                (reference.winning_move, [(a, r, c, PLAYER1) for a, (r, c) in zip(arrays, last)]),
+            ),
+            "get_valid_moves": (
+                (get_valid_moves, [(b,) for b in boards]),
+                (reference.get_valid_moves, [(a,) for a in arrays]),
+            ),
+            "score_position": (
+                (score_position, [(b, PLAYER1) for b in boards]),
+                (reference.score_position, [(a, PLAYER1) for a in arrays]),
+            ),
+        }
+        for primitive, ((engine_fn, engine_calls), (reference_fn, reference_calls)) in cases.items():
+            results["engine.%s.%s" % (primitive, name)] = rate(engine_fn, engine_calls, min_time)
+            results["reference.%s.%s" % (primitive, name)] = rate(reference_fn, reference_calls, min_time)
+    return results
+
+
+# Build a search of one position to a depth; the search returns its node count.
+# The engine only hands positions with at most endgame_cells empty cells to
+# the endgame solver when asked to, and then starts each search with an
+# empty endgame memo so every pass solves them again.
+def make_search(impl, moves, depth, endgame_cells=0):
+    if impl == "engine":
+        board = CountingPosition(position_from_moves(moves))
+        maximizing = board.side == PLAYER1
+        table = TranspositionTable()
+
+        def search():
+            board.plays = 0
+            table.clear()
+            if endgame_cells:
+                endgame.reset()
+            minimax(board, depth, -math.inf, math.inf, maximizing, PLAYER1, table, endgame_cells=endgame_cells)
+            return board.plays + 1
+    else:
+        board = reference.board_from_moves(moves)
+        maximizing = len(moves) % 2 == 0
+
+        def search():
+            reference.nodes = 0
+            reference.minimax(board, depth, -math.inf, math.inf, maximizing)
+            return reference.nodes
+    return search
+
+
+# Search a set of positions to a depth, repeating the set for at least
+# min_time; returns (nodes per pass, seconds per pass, peak bytes of one search)
+def run_search(impl, moves_list, depth, min_time, endgame_cells=0):
+    searches = [make_search(impl, moves, depth, endgame_cells) for moves in moves_list]
+    peak = 0
+    for search in searches:
+        tracemalloc.start()
+        search()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    passes = 0
+    nodes = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        nodes += sum(search() for search in searches)
+        passes += 1
+        elapsed = time.perf_counter() - start
+    return nodes / passes, elapsed / passes, peak
+
+
+def bench_search(depths, reference_depth, min_time):
+    results = {}
+    for name, moves_list in POSITION_SETS.items():
+        for depth in depths:
+            impls = ["engine"] + (["reference"] if depth <= reference_depth else [])
+            for impl in impls:
+                nodes, seconds, peak = run_search(impl, moves_list, depth, min_time)
+                key = "%s.minimax.%s.d%d" % (impl, name, depth)
+                results[key + ".nodes_per_sec"] = nodes / seconds
+                results[key + ".seconds"] = seconds
+                # Nodes per position behave like b ** depth for an effective branching factor b
+                results[key + ".branching"] = (nodes / len(moves_list)) ** (1 / depth)
+                results[key + ".peak_kib"] = peak / 1024
+    return results
+
+
+# Searches of the endgame positions that solve the late ones exactly, as the
+# time-managed search and the GUI do; their nodes include the solver's
+def bench_endgame(depths, min_time):
+    results = {}
+    moves_list = POSITION_SETS["endgame"]
+    for depth in depths:
+        nodes, seconds, peak = run_search("engine", moves_list, depth, min_time, endgame.ENDGAME_CELLS)
+        key = "engine.endgame.solved.d%d" % depth
+        results[key + ".nodes_per_sec"] = nodes / seconds
+        results[key + ".seconds"] = seconds
+        results[key + ".peak_kib"] = peak / 1024
+    return results
+
+
+def timed_key(name, budget):
+    return "engine.timed.%s.%dms.worst_ms" % (name, budget)
+
+
+# Longest wall time of timed_minimax over each position set with each budget,
+# in milliseconds. The endgame memo is cleared first, so late positions are
+# solved against the deadline rather than looked up.
+def bench_timed(budgets):
+    results = {}
+    for name, moves_list in TIMED_SETS.items():
+        for budget in budgets:
+            worst = 0.0
+            for moves in moves_list:
+                endgame.reset()
+                board = position_from_moves(moves)
+                start = time.perf_counter()
+                timed_minimax(board, budget)
+                worst = max(worst, (time.perf_counter() - start) * 1000)
+            results[timed_key(name, budget)] = worst
+    return results
+
+
+# Print how each metric moved relative to an earlier run; returns the regressions
+def compare(results, baseline, threshold):
+    regressions = []
+    for key in sorted(results):
+        if key not in baseline or not baseline[key]:
+            continue
+        ratio = results[key] / baseline[key]
+        # For these metrics larger is better; for the rest smaller is better
+        better_up = key.endswith("nodes_per_sec") or key.startswith(("engine.", "reference.")) and key.count(".") == 2
+        worse = ratio < 1 - threshold if better_up else ratio > 1 + threshold
+        if worse:
+            regressions.append(key)
+        print("%-60s %12.4g -> %12.4g  x%.2f%s" % (key, baseline[key], results[key], ratio, "  REGRESSION" if worse else ""))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the connect 4 engine against the original NumPy code.")
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 4, 6])
+    parser.add_argument("--reference-depth", type=int, default=4, help="deepest search run with the NumPy code")
+    parser.add_argument("--timed-ms", type=int, nargs="+", default=[20, 50], help="budgets of the timed searches")
+    parser.add_argument("--margin-ms", type=float, default=5, help="most a timed search may overrun its budget")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each primitive and search")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative change counted as a regression")
+    args = parser.parse_args(argv)
+
+    results = {}
+    results.update(bench_primitives(args.min_time))
+    results.update(bench_search(args.depths, args.reference_depth, args.min_time))
+    results.update(bench_endgame(args.depths, args.min_time))
+    results.update(bench_timed(args.timed_ms))
+    report = {"python": platform.python_version(), "results": results}
+    overruns = [(timed_key(name, budget), budget) for name in TIMED_SETS for budget in args.timed_ms
+                if results[timed_key(name, budget)] > budget + args.margin_ms]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+    elif not args.output:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    # Both kinds of failure are reported before exiting
+    for key, budget in overruns:
+        print("%s: %.1f ms for a budget of %d ms" % (key, results[key], budget), file=sys.stderr)
+    if regressions or overruns:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
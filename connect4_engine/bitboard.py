@@ -0,0 +1,362 @@
+# Bitboard representation of a connect 4 position
+#
+# Each column uses rows + 1 bits (the extra sentinel bit keeps shifted
+# alignments from wrapping into the next column). Bit index for a cell is
+# col * (rows + 1) + row, with row 0 at the bottom of the board, which is the
+# same orientation connect4_final.py uses for its NumPy board. The board size
+# and the number of stones in a row needed to win come from a Variant; the
+# default is the standard 6 rows, 7 columns and 4 in a row.
+import functools
+
+# Constants
+ROWS = 6
+COLS = 7
+CONNECT = 4
+EMPTY = 0
+PLAYER1 = 1
+PLAYER2 = 2
+
+
+# Shifts that reduce a set of stones to the first stone of every run of
+# length stones along a direction, doubling the run length at each step
+def run_shifts(shift, length):
+    shifts = []
+    run = 1
+    while 2 * run <= length:
+        shifts.append(run * shift)
+        run *= 2
+    if run < length:
+        shifts.append((length - run) * shift)
+    return tuple(shifts)
+
+
+# Board size and connect length, with the bit masks and shifts derived from
+# them. Variants are compared by their dimensions; get_variant returns one
+# shared instance per variant, so its per-variant caches are shared as well.
+class Variant:
+    def __init__(self, rows=ROWS, cols=COLS, connect=CONNECT):
+        if rows < 1 or cols < 1 or not 3 <= connect <= max(rows, cols):
+            raise ValueError("cannot play %d in a row on %d rows and %d columns" % (connect, rows, cols))
+        self.rows = rows
+        self.cols = cols
+        self.connect = connect
+        self.dims = (rows, cols, connect)
+        self.cells = rows * cols
+        self.column_height = rows + 1
+        self.bottom_mask = sum(1 << (c * self.column_height) for c in range(cols))
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)
+        # Shifts for vertical, horizontal and the two diagonal directions
+        self.directions = (1, self.column_height, self.column_height - 1, self.column_height + 1)
+        self.run_shifts = tuple(run_shifts(shift, connect) for shift in self.directions)
+        # Shifts by 1 to connect - 1 cells along the non-vertical directions
+        self.line_shifts = tuple(tuple(d * shift for d in range(1, connect)) for shift in self.directions[1:])
+        # Bit offset of the mirror image of each column
+        self.mirror_offsets = tuple((cols - 1 - c) * self.column_height for c in range(cols))
+        # Columns, center first
+        self.move_order = tuple(sorted(range(cols), key=lambda c: abs(cols // 2 - c)))
+        # Playable cells of each column, and the move order with a given
+        # column moved to the front, so searches never build move lists
+        self.column_masks = tuple(self.column_mask(c) for c in range(cols))
+        self.first_move_orders = tuple((c,) + tuple(m for m in self.move_order if m != c) for c in range(cols))
+
+    def __eq__(self, other):
+        return isinstance(other, Variant) and self.dims == other.dims
+
+    def __hash__(self):
+        return hash(self.dims)
+
+    # Unpickle to the shared instance
+    def __reduce__(self):
+        return get_variant, self.dims
+
+    def __repr__(self):
+        return "Variant(rows=%d, cols=%d, connect=%d)" % self.dims
+
+    # Bit of the lowest cell of a column
+    def bottom_bit(self, col):
+        return 1 << (col * self.column_height)
+
+    # Bits of every playable cell of a column
+    def column_mask(self, col):
+        return ((1 << self.rows) - 1) << (col * self.column_height)
+
+    # Bit of a single cell
+    def cell_bit(self, row, col):
+        return 1 << (col * self.column_height + row)
+
+    # Check a set of stones for connect in a row
+    def alignment(self, stones):
+        for shifts in self.run_shifts:
+            run = stones
+            for shift in shifts:
+                run &= run >> shift
+            if run:
+                return True
+        return False
+
+    # Get the cells of the first connect in a row found in a set of stones
+    def alignment_cells(self, stones):
+        height = self.column_height
+        for direction, shifts in zip(self.directions, self.run_shifts):
+            run = stones
+            for shift in shifts:
+                run &= run >> shift
+            if run:
+                start = (run & -run).bit_length() - 1
+                return [((start + i * direction) % height, (start + i * direction) // height)
+                        for i in range(self.connect)]
+        return []
+
+    # Get the empty cells that would complete connect in a row for a set of stones
+    def winning_cells(self, stones, mask):
+        # Vertical
+        cells = stones << 1
+        for i in range(2, self.connect):
+            cells &= stones << i
+        # Horizontal and diagonals: the cell completes a line when the stones
+        # run for d cells on one side and connect - 1 - d cells on the other
+        for shifts in self.line_shifts:
+            after = [-1]
+            run = -1
+            for shift in shifts:
+                run &= stones >> shift
+                after.append(run)
+            before = -1
+            for d, shift in enumerate(shifts):
+                cells |= before & after[-1 - d]
+                before &= stones << shift
+            cells |= before
+        return cells & (self.board_mask ^ mask)
+
+    # Reflect a bitboard (or position key) across the center column
+    def mirror_bits(self, bits):
+        height = self.column_height
+        column_bits = (1 << height) - 1
+        mirrored = 0
+        for c in range(self.cols):
+            column = (bits >> (c * height)) & column_bits
+            mirrored |= column << ((self.cols - 1 - c) * height)
+        return mirrored
+
+
+@functools.lru_cache(maxsize=None)
+def get_variant(rows=ROWS, cols=COLS, connect=CONNECT):
+    return Variant(rows, cols, connect)
+
+
+# Parse a variant written as ROWSxCOLS or ROWSxCOLSxCONNECT, e.g. "7x8x4",
+# optionally refusing boards of more than max_cells cells
+def parse_variant(text, max_cells=None):
+    try:
+        dims = [int(part) for part in text.lower().split("x")]
+    except ValueError:
+        dims = []
+    if len(dims) not in (2, 3):
+        raise ValueError("variant should look like 6x7 or 6x7x4, not %r" % text)
+    if max_cells is not None and dims[0] * dims[1] > max_cells:
+        raise ValueError("boards are limited to %d cells" % max_cells)
+    return get_variant(*dims)
+
+
+STANDARD = get_variant()
+
+# Masks and helpers of the standard 6x7 connect 4 board
+COLUMN_HEIGHT = STANDARD.column_height
+BOTTOM_MASK = STANDARD.bottom_mask
+BOARD_MASK = STANDARD.board_mask
+DIRECTIONS = STANDARD.directions
+bottom_bit = STANDARD.bottom_bit
+column_mask = STANDARD.column_mask
+cell_bit = STANDARD.cell_bit
+alignment = STANDARD.alignment
+alignment_cells = STANDARD.alignment_cells
+winning_cells = STANDARD.winning_cells
+mirror_bits = STANDARD.mirror_bits
+
+
+class Position:
+    # current holds the stones of the player to move, mask holds every stone;
+    # mirror_current and mirror_mask hold the same for the mirror image.
+    # history doubles as the undo stack of play and undo.
+    __slots__ = ("variant", "current", "mask", "mirror_current", "mirror_mask", "heights", "moves", "side", "history")
+
+    def __init__(self, variant=STANDARD):
+        self.variant = variant
+        self.current = 0
+        self.mask = 0
+        self.mirror_current = 0
+        self.mirror_mask = 0
+        self.heights = [0] * variant.cols
+        self.moves = 0
+        self.side = PLAYER1
+        self.history = []
+
+    def copy(self):
+        other = Position.__new__(Position)
+        other.variant = self.variant
+        other.current = self.current
+        other.mask = self.mask
+        other.mirror_current = self.mirror_current
+        other.mirror_mask = self.mirror_mask
+        other.heights = self.heights[:]
+        other.moves = self.moves
+        other.side = self.side
+        other.history = self.history[:]
+        return other
+
+    # Unique key of the position, suitable for hashing
+    def key(self):
+        return self.current + self.mask
+
+    # Key of the mirror image of the position
+    def mirror_key(self):
+        return self.mirror_current + self.mirror_mask
+
+    # Key shared by the position and its mirror image (the smaller of the
+    # two keys), and whether it is the mirror's. Moves stored under this key
+    # must be mirrored back with mirror_move when mirrored is True.
+    def canonical_key(self):
+        key = self.current + self.mask
+        mirror = self.mirror_current + self.mirror_mask
+        if mirror < key:
+            return mirror, True
+        return key, False
+
+    # Column of a move in the mirror image of the board
+    def mirror_move(self, col):
+        return self.variant.cols - 1 - col
+
+    # Stones belonging to a piece
+    def stones(self, piece):
+        if piece == self.side:
+            return self.current
+        return self.current ^ self.mask
+
+    # Piece in a cell, row 0 being the bottom row
+    def cell(self, row, col):
+        bit = self.variant.cell_bit(row, col)
+        if not self.mask & bit:
+            return EMPTY
+        if self.current & bit:
+            return self.side
+        return PLAYER1 + PLAYER2 - self.side
+
+    def __getitem__(self, row):
+        return tuple(self.cell(row, c) for c in range(self.variant.cols))
+
+    def can_play(self, col):
+        return self.heights[col] < self.variant.rows
+
+    # Mask of the cells where the next stone can go
+    def legal_moves(self):
+        variant = self.variant
+        return (self.mask + variant.bottom_mask) & variant.board_mask
+
+    def valid_moves(self):
+        rows = self.variant.rows
+        return [c for c, height in enumerate(self.heights) if height < rows]
+
+    def is_full(self):
+        return self.moves == self.variant.cells
+
+    # Check whether playing a column wins for the player to move
+    def is_winning_move(self, col):
+        variant = self.variant
+        stones = self.current | ((self.mask + variant.bottom_bit(col)) & variant.column_mask(col))
+        return variant.alignment(stones)
+
+    # Check whether the player to move can win with their next stone
+    def can_win_next(self):
+        return bool(self.variant.winning_cells(self.current, self.mask) & self.legal_moves())
+
+    # Check whether the player who just moved has connect in a row
+    def last_move_won(self):
+        return self.variant.alignment(self.current ^ self.mask)
+
+    def play(self, col):
+        variant = self.variant
+        height = self.heights[col]
+        self.current ^= self.mask
+        self.mask |= 1 << (col * variant.column_height + height)
+        self.mirror_current ^= self.mirror_mask
+        self.mirror_mask |= 1 << (variant.mirror_offsets[col] + height)
+        self.heights[col] = height + 1
+        self.moves += 1
+        self.side = PLAYER1 + PLAYER2 - self.side
+        self.history.append(col)
+
+    def undo(self):
+        col = self.history.pop()
+        variant = self.variant
+        height = self.heights[col] - 1
+        self.heights[col] = height
+        self.mask ^= 1 << (col * variant.column_height + height)
+        self.current ^= self.mask
+        self.mirror_mask ^= 1 << (variant.mirror_offsets[col] + height)
+        self.mirror_current ^= self.mirror_mask
+        self.moves -= 1
+        self.side = PLAYER1 + PLAYER2 - self.side
+        return col
+
+    # Hand the move to the other player without placing a stone
+    def pass_turn(self):
+        self.current ^= self.mask
+        self.mirror_current ^= self.mirror_mask
+        self.side = PLAYER1 + PLAYER2 - self.side
+
+    def to_array(self):
+        import numpy as np
+        board = np.zeros((self.variant.rows, self.variant.cols), dtype=np.int8)
+        for r in range(self.variant.rows):
+            board[r] = self[r]
+        return board
+
+    # Moves played so far as 1-based column digits, e.g. "4453"
+    def move_string(self):
+        return "".join(str(c + 1) for c in self.history)
+
+    def __repr__(self):
+        return "Position(%s)" % self.move_string()
+
+
+# Create an empty board
+def create_board(variant=STANDARD):
+    return Position(variant)
+
+
+# Build a position from 1-based column digits, e.g. "4453"
+def position_from_moves(moves, variant=STANDARD):
+    board = Position(variant)
+    for ch in moves:
+        board.play(int(ch) - 1)
+    return board
+
+
+# Drop a piece into a column; the row is implied by the column height
+def drop_piece(board, row, col, piece):
+    if piece != board.side:
+        board.pass_turn()
+    board.play(col)
+
+
+def is_valid_location(board, col):
+    return board.can_play(col)
+
+
+def get_next_open_row(board, col):
+    if board.can_play(col):
+        return board.heights[col]
+
+
+def get_valid_moves(board):
+    return board.valid_moves()
+
+
+def is_tie(board):
+    return board.is_full()
+
+
+# Check a piece for connect in a row, returning the winning cells as (row, col)
+def winning_move(board, piece):
+    cells = board.variant.alignment_cells(board.stones(piece))
+    return bool(cells), cells
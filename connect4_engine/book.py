@@ -0,0 +1,154 @@
+# Opening book: precomputed values and moves for the first plies
+#
+# The book file is a small header followed by fixed-size records sorted by
+# position key, so a lookup is a binary search over a memory-mapped file and
+# nothing has to be loaded up front. A position and its mirror image share a
+# record, stored under their canonical key (the smaller of their two keys).
+#
+#   python -m connect4_engine.book generate --ply 4 --output opening_book.bin
+#   python -m connect4_engine.book lookup 4453 --book opening_book.bin
+import argparse
+import mmap
+import os
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+from .bitboard import STANDARD, Position, position_from_moves
+from .solver import Solver
+
+MAGIC = b"C4BK"
+VERSION = 1
+# magic, version, deepest ply, record count
+HEADER = struct.Struct("<4sHHI")
+# position key, value for the player to move, move (high bit set when exact)
+RECORD = struct.Struct("<QbB")
+EXACT_FLAG = 0x80
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "opening_book.bin")
+
+
+# Every unfinished position up to a ply, one per mirror pair, as move lists
+def enumerate_positions(max_ply):
+    seen = {}
+    frontier = [Position()]
+    for ply in range(max_ply + 1):
+        next_frontier = []
+        for board in frontier:
+            key, _ = board.canonical_key()
+            if key in seen:
+                continue
+            seen[key] = board.history[:]
+            if ply == max_ply:
+                continue
+            for col in board.valid_moves():
+                if board.is_winning_move(col):
+                    continue
+                child = board.copy()
+                child.play(col)
+                if not child.is_full():
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return list(seen.values())
+
+
+# Solve a list of positions in a worker; returns (key, value, move byte) records
+def solve_positions(move_lists, time_ms):
+    solver = Solver()
+    records = []
+    for moves in move_lists:
+        board = Position()
+        for col in moves:
+            board.play(col)
+        value, col, exact = solver.best_move(board, time_ms)
+        key, mirrored = board.canonical_key()
+        if mirrored:
+            col = board.mirror_move(col)
+        records.append((key, int(value) if exact else 0, col | (EXACT_FLAG if exact else 0)))
+    return records
+
+
+def generate(path, max_ply, time_ms=None, workers=None, chunk_size=16):
+    positions = enumerate_positions(max_ply)
+    # Deeper positions first, so they warm each worker's table for their parents
+    positions.sort(key=len, reverse=True)
+    chunks = [positions[i:i + chunk_size] for i in range(0, len(positions), chunk_size)]
+    records = []
+    with ProcessPoolExecutor(workers) as executor:
+        for chunk_records in executor.map(solve_positions, chunks, [time_ms] * len(chunks)):
+            records.extend(chunk_records)
+    records.sort()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, max_ply, len(records)))
+        for record in records:
+            f.write(RECORD.pack(*record))
+    return len(records)
+
+
+class OpeningBook:
+    def __init__(self, path=DEFAULT_PATH):
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_ply, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("%s is not a version %d opening book" % (path, VERSION))
+
+    # Return (value, column, exact) for the player to move, or None if the
+    # position is not in the book; the book only covers the standard board
+    def lookup(self, board):
+        if board.moves > self.max_ply or board.variant != STANDARD:
+            return None
+        key, mirrored = board.canonical_key()
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = HEADER.size + mid * RECORD.size
+            mid_key, value, move = RECORD.unpack_from(self.data, offset)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                col = move & ~EXACT_FLAG
+                if mirrored:
+                    col = board.mirror_move(col)
+                return value, col, bool(move & EXACT_FLAG)
+        return None
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __len__(self):
+        return self.count
+
+
+# Open the book at path, or return None if there is no book file
+def load_book(path=DEFAULT_PATH):
+    if not os.path.exists(path):
+        return None
+    return OpeningBook(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the connect 4 opening book.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("generate", help="solve every position up to a ply and write the book")
+    build.add_argument("--ply", type=int, default=4)
+    build.add_argument("--time-ms", type=float, default=None,
+                       help="time budget per position; positions not solved in time keep a heuristic move")
+    build.add_argument("--workers", type=int, default=None)
+    build.add_argument("--output", default=DEFAULT_PATH)
+    query = commands.add_parser("lookup", help="look up a position given as 1-based column digits")
+    query.add_argument("moves", nargs="?", default="")
+    query.add_argument("--book", default=DEFAULT_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "generate":
+        count = generate(args.output, args.ply, args.time_ms, args.workers)
+        print("wrote %d positions to %s" % (count, args.output))
+    else:
+        book = OpeningBook(args.book)
+        print(book.lookup(position_from_moves(args.moves)))
+
+
+if __name__ == "__main__":
+    main()
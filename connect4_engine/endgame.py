@@ -0,0 +1,104 @@
+# Exact values of late positions, remembered across searches and games
+#
+# With few empty cells left the solver settles a position faster than a
+# heuristic search can explore it, and without missing forced wins, so
+# minimax can switch to exact values at ENDGAME_CELLS empty cells (the
+# time-managed search, the GUI and the server's agents ask it to). Solved
+# positions go into an LRU memo shared by every search in the process: the
+# later moves of a game, and other games reaching the same positions (as in a
+# long-running server), are answered from it.
+import threading
+from collections import OrderedDict
+
+from .tt import TranspositionTable
+
+# Positions with at most this many empty cells are solved exactly
+ENDGAME_CELLS = 12
+# Solved positions kept in the memo
+MEMO_ENTRIES = 1 << 16
+# Memory cap of the transposition table of each endgame solver
+ENDGAME_TABLE_BYTES = 8 * 1024 * 1024
+
+
+# Least recently used entries are dropped once the memo is full. Searches on
+# different threads (the GUI's AI and its ponderer) share it, hence the lock.
+class EndgameMemo:
+    def __init__(self, entries=MEMO_ENTRIES):
+        self.entries = entries
+        self.values = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            value = self.values.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.values.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self.lock:
+            self.values[key] = value
+            self.values.move_to_end(key)
+            if len(self.values) > self.entries:
+                self.values.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self.values)
+
+
+MEMO = EndgameMemo()
+
+_local = threading.local()
+
+
+# Forget the positions solved so far and the tables of this thread's solvers
+def reset(memo=MEMO):
+    memo.clear()
+    for solver in getattr(_local, "solvers", {}).values():
+        solver.table.clear()
+
+
+# Solver of the calling thread for a variant, kept with its table between calls
+def thread_solver(variant):
+    # Imported here because the solver imports the search, which imports this module
+    from .solver import Solver
+    solvers = getattr(_local, "solvers", None)
+    if solvers is None:
+        solvers = _local.solvers = {}
+    if variant not in solvers:
+        solvers[variant] = Solver(TranspositionTable(ENDGAME_TABLE_BYTES))
+    return solvers[variant]
+
+
+# Exact value of a position for the player to move, in the solver's scores,
+# and the best move (None on a full board). Positions and their mirror images
+# share a memo entry.
+def solve_endgame(board, memo=MEMO, cancel=None):
+    if board.is_full():
+        return 0, None
+    key, mirrored = board.canonical_key()
+    key = (board.variant.dims, key)
+    entry = memo.get(key)
+    if entry is None:
+        value, col, _ = thread_solver(board.variant).best_move(board, cancel=cancel)
+        memo.put(key, (value, board.mirror_move(col) if mirrored else col))
+    else:
+        value, col = entry
+        if mirrored:
+            col = board.mirror_move(col)
+    return value, col
@@ -0,0 +1,242 @@
+# Heuristic evaluation on bitboards, by default with the same weights as
+# evaluate_window/score_position in connect4.py. The window tables are built
+# once per Variant and set of weights, with windows as long as the variant's
+# connect length.
+import functools
+
+from .bitboard import PLAYER1, PLAYER2, STANDARD
+
+
+# Weights of the heuristic: a window filled by own pieces (line), one piece
+# short with the last cell empty (near), two pieces short with both empty
+# (far), one opponent piece short (opponent_near), and each own piece in a
+# center column. connect4_engine.tuner fits them from solved positions.
+class Weights:
+    FIELDS = ("line", "near", "far", "opponent_near", "center")
+
+    def __init__(self, line=100, near=5, far=2, opponent_near=-4, center=3):
+        self.line = line
+        self.near = near
+        self.far = far
+        self.opponent_near = opponent_near
+        self.center = center
+
+    def values(self):
+        return tuple(getattr(self, field) for field in self.FIELDS)
+
+    def to_dict(self):
+        return dict(zip(self.FIELDS, self.values()))
+
+    # Weights from a dict; missing fields keep their default
+    @classmethod
+    def from_dict(cls, data):
+        unknown = set(data) - set(cls.FIELDS)
+        if unknown:
+            raise ValueError("unknown weights: %s" % ", ".join(sorted(unknown)))
+        return cls(**data)
+
+    def __eq__(self, other):
+        return isinstance(other, Weights) and self.values() == other.values()
+
+    def __hash__(self):
+        return hash(self.values())
+
+    def __repr__(self):
+        return "Weights(%s)" % ", ".join("%s=%r" % item for item in self.to_dict().items())
+
+
+DEFAULT_WEIGHTS = Weights()
+CENTER_WEIGHT = DEFAULT_WEIGHTS.center
+
+
+# Read weights saved as a JSON object, e.g. by the tuner
+def load_weights(path):
+    import json
+    with open(path) as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("%s: weights must be a JSON object" % path)
+    return Weights.from_dict(data)
+
+
+def save_weights(weights, path):
+    import json
+    with open(path, "w") as f:
+        json.dump(weights.to_dict(), f, indent=2)
+        f.write("\n")
+
+
+# Cells of every window of connect cells, as lists of (row, col)
+def window_cells(variant=STANDARD):
+    rows, cols, length = variant.rows, variant.cols, variant.connect
+    windows = []
+    # Horizontal
+    for r in range(rows):
+        for c in range(cols - length + 1):
+            windows.append([(r, c + i) for i in range(length)])
+    # Vertical
+    for c in range(cols):
+        for r in range(rows - length + 1):
+            windows.append([(r + i, c) for i in range(length)])
+    # Diagonal (positive slope)
+    for r in range(rows - length + 1):
+        for c in range(cols - length + 1):
+            windows.append([(r + i, c + i) for i in range(length)])
+    # Diagonal (negative slope)
+    for r in range(length - 1, rows):
+        for c in range(cols - length + 1):
+            windows.append([(r - i, c + i) for i in range(length)])
+    return windows
+
+
+# Score a window from the number of own and opponent pieces in it
+def window_score(own, opp, length=STANDARD.connect, weights=DEFAULT_WEIGHTS):
+    empty = length - own - opp
+    score = 0
+    if own == length:
+        score += weights.line
+    elif own == length - 1 and empty == 1:
+        score += weights.near
+    elif own == length - 2 and empty == 2:
+        score += weights.far
+    if opp == length - 1 and empty == 1:
+        score += weights.opponent_near
+    return score
+
+
+# Window masks and score tables of a variant and set of weights
+class EvaluationTables:
+    def __init__(self, variant, weights=DEFAULT_WEIGHTS):
+        length = variant.connect
+        self.weights = weights
+        self.center_weight = weights.center
+        self.windows = window_cells(variant)
+        self.window_masks = [sum(variant.cell_bit(r, c) for r, c in window) for window in self.windows]
+        # The middle column, or both middle columns on an even width, so that
+        # a position and its mirror image score the same
+        self.center_columns = frozenset((variant.cols // 2, (variant.cols - 1) // 2))
+        self.center_mask = sum(variant.column_mask(c) for c in self.center_columns)
+        # window_scores[own][opp]
+        self.window_scores = [[window_score(own, opp, length, weights) if own + opp <= length else 0
+                               for opp in range(length + 1)] for own in range(length + 1)]
+        # Windows through each cell, indexed by row * cols + col
+        self.cell_windows = [[] for _ in range(variant.cells)]
+        for index, window in enumerate(self.windows):
+            for r, c in window:
+                self.cell_windows[r * variant.cols + c].append(index)
+        # Change in the window score of the player adding a piece (gain) and
+        # of their opponent (loss), indexed by [own][opp] before the piece is added
+        scores = self.window_scores
+        self.gain = [[scores[own + 1][opp] - scores[own][opp] if own + opp < length else 0
+                      for opp in range(length + 1)] for own in range(length + 1)]
+        self.loss = [[scores[opp][own + 1] - scores[opp][own] if own + opp < length else 0
+                      for opp in range(length + 1)] for own in range(length + 1)]
+
+
+@functools.lru_cache(maxsize=None)
+def evaluation_tables(variant, weights=DEFAULT_WEIGHTS):
+    return EvaluationTables(variant, weights)
+
+
+# Tables of the standard board
+_STANDARD_TABLES = evaluation_tables(STANDARD)
+WINDOW_LENGTH = STANDARD.connect
+WINDOWS = _STANDARD_TABLES.windows
+WINDOW_MASKS = _STANDARD_TABLES.window_masks
+CENTER_MASK = _STANDARD_TABLES.center_mask
+WINDOW_SCORES = _STANDARD_TABLES.window_scores
+CELL_WINDOWS = _STANDARD_TABLES.cell_windows
+GAIN = _STANDARD_TABLES.gain
+LOSS = _STANDARD_TABLES.loss
+
+
+# Evaluate a window given as a list of pieces
+def evaluate_window(window, piece):
+    opp_piece = PLAYER1 if piece == PLAYER2 else PLAYER2
+    return WINDOW_SCORES[window.count(piece)][window.count(opp_piece)]
+
+
+# Get the score of the board for a piece
+def score_position(board, piece, weights=DEFAULT_WEIGHTS):
+    tables = evaluation_tables(board.variant, weights)
+    own = board.stones(piece)
+    opp = board.mask ^ own
+    scores = tables.window_scores
+    score = (own & tables.center_mask).bit_count() * tables.center_weight
+    for window in tables.window_masks:
+        score += scores[(own & window).bit_count()][(opp & window).bit_count()]
+    return score
+
+
+# Keeps score_position up to date for both pieces as stones are played and
+# taken back, touching only the windows through the changed cell
+class IncrementalEvaluator:
+    __slots__ = ("tables", "cols", "counts", "scores")
+
+    def __init__(self, board=None, variant=STANDARD, weights=DEFAULT_WEIGHTS):
+        if board is not None:
+            variant = board.variant
+        self.tables = evaluation_tables(variant, weights)
+        self.cols = variant.cols
+        windows = len(self.tables.windows)
+        self.counts = [None, [0] * windows, [0] * windows]
+        self.scores = [None, 0, 0]
+        if board is not None:
+            for r in range(variant.rows):
+                for c in range(variant.cols):
+                    piece = board.cell(r, c)
+                    if piece:
+                        self.add(r, c, piece)
+
+    def add(self, row, col, piece):
+        tables = self.tables
+        other = PLAYER1 + PLAYER2 - piece
+        own = self.counts[piece]
+        opp = self.counts[other]
+        gains = tables.gain
+        losses = tables.loss
+        gain = tables.center_weight if col in tables.center_columns else 0
+        loss = 0
+        for w in tables.cell_windows[row * self.cols + col]:
+            a = own[w]
+            b = opp[w]
+            gain += gains[a][b]
+            loss += losses[a][b]
+            own[w] = a + 1
+        self.scores[piece] += gain
+        self.scores[other] += loss
+
+    def remove(self, row, col, piece):
+        tables = self.tables
+        other = PLAYER1 + PLAYER2 - piece
+        own = self.counts[piece]
+        opp = self.counts[other]
+        gains = tables.gain
+        losses = tables.loss
+        gain = tables.center_weight if col in tables.center_columns else 0
+        loss = 0
+        for w in tables.cell_windows[row * self.cols + col]:
+            a = own[w] - 1
+            b = opp[w]
+            gain += gains[a][b]
+            loss += losses[a][b]
+            own[w] = a
+        self.scores[piece] -= gain
+        self.scores[other] -= loss
+
+    # Play a column on the board and update the scores
+    def play(self, board, col):
+        row = board.heights[col]
+        piece = board.side
+        board.play(col)
+        self.add(row, col, piece)
+
+    # Take back the last move on the board and update the scores
+    def undo(self, board):
+        col = board.undo()
+        self.remove(board.heights[col], col, board.side)
+        return col
+
+    # Same value as score_position(board, piece, weights)
+    def score(self, piece):
+        return self.scores[piece]
@@ -0,0 +1,109 @@
+# Parallel minimax: Young Brothers Wait at the root over a process pool
+#
+# The first root move (the table's best move, else the center-first one) is
+# searched on its own with a full window, in the caller's table. Its value
+# then bounds the rest, which are searched at the same time in worker
+# processes with a null window at that value: a move that cannot beat the
+# first one is refuted cheaply, and only moves that fail high are searched
+# again for their exact value. Workers start from a copy of the deep entries
+# of the caller's table and send theirs back to be merged into it.
+#
+# Every worker search depends only on the position and the first move's
+# value, not on which worker ran it or when, so the result is the same from
+# run to run. Ties between root moves go to the earlier move in the search
+# order, as in minimax.
+import math
+from concurrent.futures import ProcessPoolExecutor
+
+from .search import minimax, table_key
+from .threats import immediate_wins, non_losing_moves
+from .tt import DEFAULT_MAX_BYTES, EXACT, TranspositionTable
+
+# Entries at least this deep are copied between the caller and the workers
+MERGE_DEPTH = 2
+
+
+# Search one root move in a worker process with a null window at bound, from
+# the point of view of the root (maximizing says whether it maximizes), and
+# again with an open window if the move beats bound. Returns (column, value,
+# better, entries, stats); value is exact only when better is True.
+def search_root_move(board, col, depth, piece, maximizing, bound, seed_entries, table_bytes):
+    table = TranspositionTable(table_bytes)
+    table.merge(seed_entries)
+    board.play(col)
+    if maximizing:
+        value = minimax(board, depth - 1, bound, bound + 1, False, piece, table)[0]
+        better = value > bound
+        if better:
+            value = minimax(board, depth - 1, bound, math.inf, False, piece, table)[0]
+    else:
+        value = minimax(board, depth - 1, bound - 1, bound, True, piece, table)[0]
+        better = value < bound
+        if better:
+            value = minimax(board, depth - 1, -math.inf, bound, True, piece, table)[0]
+    return col, value, better, list(table.entries(MERGE_DEPTH)), table.stats()
+
+
+class ParallelSearch:
+    def __init__(self, workers=None, table=None, table_bytes=DEFAULT_MAX_BYTES):
+        self.executor = ProcessPoolExecutor(workers)
+        self.table = table if table is not None else TranspositionTable(table_bytes)
+        self.table_bytes = table_bytes
+        self.worker_stats = []
+
+    # Same result as minimax(board, depth, -inf, inf, board.side == piece,
+    # piece) with the same table, for the player to move unless piece says
+    # otherwise
+    def search(self, board, depth, piece=None):
+        if piece is None:
+            piece = board.side
+        maximizing = board.side == piece
+        self.worker_stats = []
+        moves = non_losing_moves(board) or board.legal_moves()
+        variant = board.variant
+        # Positions minimax settles without searching the root moves
+        key, mirrored = table_key(board, piece)
+        entry = self.table.lookup(key)
+        if (depth <= 1 or not moves & (moves - 1) or immediate_wins(board)
+                or board.history and board.last_move_won()
+                or entry is not None and entry[0] >= depth and entry[1] == EXACT):
+            return minimax(board, depth, -math.inf, math.inf, maximizing, piece, self.table)
+
+        order = variant.move_order
+        if entry is not None and entry[3] is not None:
+            first = board.mirror_move(entry[3]) if mirrored else entry[3]
+            if moves & variant.column_masks[first]:
+                order = variant.first_move_orders[first]
+        order = [col for col in order if moves & variant.column_masks[col]]
+
+        first = order[0]
+        board.play(first)
+        try:
+            value = minimax(board, depth - 1, -math.inf, math.inf, not maximizing, piece, self.table)[0]
+        finally:
+            board.undo()
+
+        seed_entries = list(self.table.entries(MERGE_DEPTH))
+        futures = [self.executor.submit(search_root_move, board, col, depth, piece, maximizing, value,
+                                        seed_entries, self.table_bytes)
+                   for col in order[1:]]
+        column = first
+        for future in futures:
+            col, score, better, entries, stats = future.result()
+            self.table.merge(entries)
+            self.worker_stats.append(stats)
+            # Moves that beat the first one have exact values; the earliest best one wins
+            if better and (score > value if maximizing else score < value):
+                value = score
+                column = col
+        self.table.store(key, depth, EXACT, value, board.mirror_move(column) if mirrored else column)
+        return value, column
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,70 @@
+# Pondering: search the AI's replies while the opponent is thinking
+#
+# While the opponent is to move, the likely replies are searched on a
+# background thread, most likely opponent move first. When the opponent
+# moves, take() stops pondering and returns the precomputed answer if that
+# move was searched already. Searches sharing a transposition table with the
+# real AI leave their entries behind for it even when their move is not played.
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .search import SearchCancelled
+from .solver import ordered_moves
+
+
+class Ponderer:
+    # search(board, cancel=event) returns the AI's answer for a position
+    def __init__(self, search):
+        self.search = search
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ponder")
+        self.future = None
+        self.cancel_event = None
+        self.position_key = None
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+
+    # Start pondering a position with the opponent to move; does nothing if
+    # that position is already being pondered
+    def ponder(self, board):
+        if self.position_key == board.key():
+            return
+        self.stop()
+        self.results = {}
+        self.position_key = board.key()
+        self.cancel_event = threading.Event()
+        self.future = self.executor.submit(self.run, board.copy(), self.cancel_event)
+
+    def run(self, board, cancel):
+        for col in ordered_moves(board):
+            board.play(col)
+            if not board.last_move_won() and not board.is_full():
+                try:
+                    self.results[board.key()] = self.search(board.copy(), cancel=cancel)
+                except SearchCancelled:
+                    return
+            board.undo()
+
+    # Stop pondering and wait for the background search to let go
+    def stop(self):
+        if self.future is not None:
+            self.cancel_event.set()
+            self.future.result()
+        self.future = None
+        self.cancel_event = None
+        self.position_key = None
+
+    # Stop pondering and return the answer for the position reached, or None
+    def take(self, board):
+        self.stop()
+        result = self.results.pop(board.key(), None)
+        self.results = {}
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def shutdown(self):
+        self.stop()
+        self.executor.shutdown()
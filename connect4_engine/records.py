@@ -0,0 +1,142 @@
+# Game records: one game per line, as a compact move sequence
+#
+#   RESULT MOVES [VARIANT]
+#
+# RESULT is 1 or 2 for the player who won, 0 for a draw and * for a game that
+# did not finish. MOVES are the columns played, 1-based, with columns past 9
+# written as letters (a is column 10), or - for a game without moves. VARIANT
+# is only given for games not played on the standard board, as
+# ROWSxCOLSxCONNECT. Blank lines and lines starting with # are skipped.
+#
+#   1 4455443
+#   * 4453 7x8x4
+#
+# Files are read and written one line at a time, gzip-compressed when the name
+# ends in .gz, so files of millions of games never have to fit in memory.
+import gzip
+import sys
+
+from .bitboard import PLAYER1, PLAYER2, STANDARD, Position, parse_variant
+
+DRAW = 0
+COLUMN_CHARS = "123456789abcdefghijklmnopqrstuvwxyz"
+RESULT_CHARS = {PLAYER1: "1", PLAYER2: "2", DRAW: "0", None: "*"}
+RESULTS = {char: result for result, char in RESULT_CHARS.items()}
+
+
+class GameRecord:
+    # moves are 0-based columns; result is PLAYER1, PLAYER2, DRAW or None
+    def __init__(self, moves, result=None, variant=STANDARD):
+        self.moves = list(moves)
+        self.result = result
+        self.variant = variant
+
+    # Replay the game on one board, yielding (board, column) before each move
+    # is played; raises ValueError on an illegal move or a move after a win
+    def positions(self):
+        board = Position(self.variant)
+        for ply, col in enumerate(self.moves):
+            if not 0 <= col < self.variant.cols or not board.can_play(col):
+                raise ValueError("illegal move in column %d at ply %d" % (col + 1, ply + 1))
+            if board.history and board.last_move_won():
+                raise ValueError("move at ply %d after the game was won" % (ply + 1))
+            yield board, col
+            board.play(col)
+
+    # Final position of the game
+    def replay(self):
+        board = Position(self.variant)
+        for board, _ in self.positions():
+            pass
+        return board
+
+    def move_string(self):
+        return "".join(COLUMN_CHARS[col] for col in self.moves)
+
+    def to_line(self):
+        fields = [RESULT_CHARS[self.result], self.move_string() or "-"]
+        if self.variant != STANDARD:
+            fields.append("%dx%dx%d" % self.variant.dims)
+        return " ".join(fields)
+
+    def __eq__(self, other):
+        return (isinstance(other, GameRecord) and self.moves == other.moves and self.result == other.result
+                and self.variant == other.variant)
+
+    def __repr__(self):
+        return "GameRecord(%s)" % self.to_line()
+
+
+# Record of the game played so far on a board
+def record_from_position(board):
+    result = None
+    if board.history and board.last_move_won():
+        result = PLAYER1 + PLAYER2 - board.side
+    elif board.is_full():
+        result = DRAW
+    return GameRecord(board.history, result, board.variant)
+
+
+def parse_record(line):
+    fields = line.split()
+    if len(fields) not in (2, 3) or fields[0] not in RESULTS:
+        raise ValueError("not a game record: %r" % line)
+    variant = parse_variant(fields[2]) if len(fields) == 3 else STANDARD
+    moves = []
+    if fields[1] != "-":
+        for char in fields[1].lower():
+            col = COLUMN_CHARS.find(char)
+            if col < 0:
+                raise ValueError("bad column %r in %r" % (char, line))
+            moves.append(col)
+    return GameRecord(moves, RESULTS[fields[0]], variant)
+
+
+# Open a record file for reading, writing or appending text; "-" is stdin or stdout
+def open_records(path, mode="r"):
+    if path == "-":
+        return sys.stdin if mode == "r" else sys.stdout
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="ascii")
+    return open(path, mode, encoding="ascii")
+
+
+# Yield the records of a file one at a time
+def read_records(path):
+    f = open_records(path)
+    try:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                record = parse_record(line)
+            except ValueError as e:
+                raise ValueError("%s:%d: %s" % (path, number, e)) from None
+            yield record
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class RecordWriter:
+    # append adds to an existing file; appending to a .gz file adds a gzip member
+    def __init__(self, path, append=False):
+        self.file = open_records(path, "a" if append else "w")
+        self.count = 0
+
+    def write(self, record):
+        self.file.write(record.to_line() + "\n")
+        self.count += 1
+
+    def close(self):
+        if self.file is sys.stdout:
+            self.file.flush()
+        else:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
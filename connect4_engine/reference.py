@@ -0,0 +1,148 @@
+# The original NumPy implementations from connect4.py, kept as a baseline
+# for benchmarks and for cross-checking the bitboard engine. Boards are
+# float arrays with row 0 at the top, as in the original script.
+import math
+import random
+
+import numpy as np
+
+ROWS = 6
+COLS = 7
+EMPTY = 0
+PLAYER1 = 1
+PLAYER2 = 2
+WINDOW_LENGTH = 4
+
+# Number of minimax calls since the counter was last reset
+nodes = 0
+
+
+# Build a board from 1-based column digits, players alternating from PLAYER1
+def board_from_moves(moves):
+    board = np.zeros((ROWS, COLS))
+    for i, ch in enumerate(moves):
+        col = int(ch) - 1
+        board[get_next_open_row(board, col)][col] = PLAYER1 if i % 2 == 0 else PLAYER2
+    return board
+
+
+# Check for a win
+def winning_move(board, row, col, piece):
+    # Check horizontal
+    for c in range(COLS - 3):
+        if board[row][c] == piece and board[row][c + 1] == piece and board[row][c + 2] == piece and board[row][c + 3] == piece:
+            return True
+    # Check vertical
+    for r in range(ROWS - 3):
+        if board[r][col] == piece and board[r + 1][col] == piece and board[r + 2][col] == piece and board[r + 3][col] == piece:
+            return True
+    # Check diagonal (positive slope)
+    for r in range(ROWS - 3):
+        for c in range(COLS - 3):
+            if board[r][c] == piece and board[r + 1][c + 1] == piece and board[r + 2][c + 2] == piece and board[r + 3][c + 3] == piece:
+                return True
+    # Check diagonal (negative slope)
+    for r in range(3, ROWS):
+        for c in range(COLS - 3):
+            if board[r][c] == piece and board[r - 1][c + 1] == piece and board[r - 2][c + 2] == piece and board[r - 3][c + 3] == piece:
+                return True
+    return False
+# Check for a tie
+def is_tie(board):
+    for c in range(COLS):
+        if board[0][c] == EMPTY:
+            return False
+    return True
+# Get the valid moves
+def get_valid_moves(board):
+    valid_moves = []
+    for c in range(COLS):
+        if board[0][c] == EMPTY:
+            valid_moves.append(c)
+    return valid_moves
+# Get the next open row
+def get_next_open_row(board, col):
+    for r in range(ROWS - 1, -1, -1):
+        if board[r][col] == EMPTY:
+            return r
+# Get the score of the board
+def score_position(board, piece):
+    score = 0
+    # Score center column
+    center_array = [int(i) for i in list(board[:, COLS // 2])]
+    center_count = center_array.count(piece)
+    score += center_count * 3
+    # Score horizontal
+    for r in range(ROWS):
+        row_array = [int(i) for i in list(board[r])]
+        for c in range(COLS - 3):
+            window = row_array[c:c + WINDOW_LENGTH]
+            score += evaluate_window(window, piece)
+    # Score vertical
+    for c in range(COLS):
+        col_array = [int(i) for i in list(board[:, c])]
+        for r in range(ROWS - 3):
+            window = col_array[r:r + WINDOW_LENGTH]
+            score += evaluate_window(window, piece)
+    # Score diagonal (positive slope)
+    for r in range(ROWS - 3):
+        for c in range(COLS - 3):
+            window = [board[r + i][c + i] for i in range(WINDOW_LENGTH)]
+            score += evaluate_window(window, piece)
+    # Score diagonal (negative slope)
+    for r in range(3, ROWS):
+        for c in range(COLS - 3):
+            window = [board[r - i][c + i] for i in range(WINDOW_LENGTH)]
+            score += evaluate_window(window, piece)
+    return score
+# Evaluate the window
+def evaluate_window(window, piece):
+    score = 0
+    opp_piece = PLAYER1 if piece == PLAYER2 else PLAYER2
+    if window.count(piece) == 4:
+        score += 100
+    elif window.count(piece) == 3 and window.count(EMPTY) == 1:
+        score += 5
+    elif window.count(piece) == 2 and window.count(EMPTY) == 2:
+        score += 2
+    if window.count(opp_piece) == 3 and window.count(EMPTY) == 1:
+        score -= 4
+    return score
+# Minimax algorithm
+def minimax(board, depth, alpha, beta, maximizing_player):
+    global nodes
+    nodes += 1
+    valid_moves = get_valid_moves(board)
+    is_terminal = False
+    if depth == 0 or is_tie(board) or len(valid_moves) == 0:
+        return score_position(board, PLAYER1), None
+    if maximizing_player:
+        value = -math.inf
+        column = random.choice(valid_moves)
+        for col in valid_moves:
+            row = get_next_open_row(board, col)
+            temp_board = board.copy()
+            temp_board[row][col] = PLAYER1
+            new_score = minimax(temp_board, depth - 1, alpha, beta, False)[0]
+            if new_score > value:
+                value = new_score
+                column = col
+            alpha = max(alpha, value)
+            if beta <= alpha:
+                break
+        return value, column
+    else:
+        value = math.inf
+        column = random.choice(valid_moves)
+        for col in valid_moves:
+            row = get_next_open_row(board, col)
+            temp_board = board.copy()
+            temp_board[row][col] = PLAYER2
+            new_score = minimax(temp_board, depth - 1, alpha, beta, True)[0]
+            if new_score < value:
+                value = new_score
+                column = col
+            beta = min(beta, value)
+            if beta <= alpha:
+                break
+        return value, column
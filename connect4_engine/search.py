@@ -0,0 +1,150 @@
+# Heuristic minimax search with alpha-beta pruning and a transposition table
+import math
+
+from .bitboard import PLAYER1
+from .endgame import solve_endgame
+from .evaluate import DEFAULT_WEIGHTS, IncrementalEvaluator
+from .threats import immediate_wins, non_losing_moves
+from .tt import EXACT, LOWER, UPPER
+
+WIN_SCORE = 1000000
+
+
+# Raised inside a search when its cancel event is set
+class SearchCancelled(Exception):
+    pass
+
+
+# Table key for a position scored from the point of view of piece, shared
+# with its mirror image, and whether the key is the mirror's
+def table_key(board, piece):
+    key, mirrored = board.canonical_key()
+    return key << 1 | (piece != PLAYER1), mirrored
+
+
+# Minimax algorithm; values are from the point of view of piece, which is the
+# maximizing player. Returns (value, column) like connect4.py's minimax.
+# Immediate wins end the search at once and moves that let the opponent win
+# next are skipped (see threats.py). Leaves are scored by an
+# IncrementalEvaluator with the given weights that follows the search (a table
+# should only ever see one set of weights), and a SearchStats passed as stats
+# collects node, cutoff and table counts.
+# With endgame_cells set (ENDGAME_CELLS is the usual value), positions with at
+# most that many empty cells get their exact value from the endgame memo or
+# solver (see endgame.py) instead of being searched; a win is then WIN_SCORE
+# plus the solver's score. It is off by default, as the memo makes values and
+# node counts depend on earlier searches.
+# Setting a threading.Event passed as cancel aborts the search with
+# SearchCancelled, leaving the board with moves still played on it.
+# Moves are made and taken back on the one board, and tried in the variant's
+# precomputed center-first order, so a node allocates no boards or lists.
+def minimax(board, depth, alpha, beta, maximizing_player, piece=PLAYER1, table=None, evaluator=None, stats=None,
+            cancel=None, weights=DEFAULT_WEIGHTS, endgame_cells=0):
+    if cancel is not None and cancel.is_set():
+        raise SearchCancelled()
+    if stats is not None:
+        stats.nodes[depth] += 1
+    # The player who just moved may already have won
+    if board.history and board.last_move_won():
+        score = WIN_SCORE + depth
+        return (-score if maximizing_player else score), None
+    if endgame_cells and board.variant.cells - board.moves <= endgame_cells:
+        if stats is not None:
+            stats.endgame_solves += 1
+        value, col = solve_endgame(board, cancel=cancel)
+        if value:
+            value += WIN_SCORE if value > 0 else -WIN_SCORE
+        return (value if maximizing_player else -value), col
+    if evaluator is None:
+        evaluator = IncrementalEvaluator(board, weights=weights)
+    variant = board.variant
+    if depth <= 0 or board.moves == variant.cells:
+        if stats is not None:
+            stats.leaf_evals += 1
+        return evaluator.score(piece), None
+
+    # A stone that wins at once needs no search, and moves that hand the
+    # opponent a win are dropped unless every move does
+    wins = immediate_wins(board)
+    if wins:
+        score = WIN_SCORE + depth - 1
+        # Leftmost winning column
+        return (score if maximizing_player else -score), ((wins & -wins).bit_length() - 1) // variant.column_height
+    moves = non_losing_moves(board) or board.legal_moves()
+    column_masks = variant.column_masks
+    order = variant.move_order
+
+    key = None
+    mirrored = False
+    best_move = None
+    alpha_orig, beta_orig = alpha, beta
+    if table is not None:
+        key, mirrored = table_key(board, piece)
+        entry = table.lookup(key)
+        if entry is not None:
+            if stats is not None:
+                stats.table_hits += 1
+            entry_depth, flag, value, best_move = entry
+            if mirrored and best_move is not None:
+                best_move = board.mirror_move(best_move)
+            if entry_depth >= depth:
+                if flag == EXACT:
+                    return value, best_move
+                if flag == LOWER:
+                    alpha = max(alpha, value)
+                elif flag == UPPER:
+                    beta = min(beta, value)
+                if alpha >= beta:
+                    return value, best_move
+            # Try the stored best move first
+            if best_move is not None and moves & column_masks[best_move]:
+                order = variant.first_move_orders[best_move]
+
+    column = None
+    i = 0
+    if maximizing_player:
+        value = -math.inf
+        for col in order:
+            if not moves & column_masks[col]:
+                continue
+            evaluator.play(board, col)
+            new_score = minimax(board, depth - 1, alpha, beta, False, piece, table, evaluator, stats, cancel,
+                                endgame_cells=endgame_cells)[0]
+            evaluator.undo(board)
+            if new_score > value:
+                value = new_score
+                column = col
+            alpha = max(alpha, value)
+            if beta <= alpha:
+                if stats is not None:
+                    stats.cutoffs[i] += 1
+                break
+            i += 1
+    else:
+        value = math.inf
+        for col in order:
+            if not moves & column_masks[col]:
+                continue
+            evaluator.play(board, col)
+            new_score = minimax(board, depth - 1, alpha, beta, True, piece, table, evaluator, stats, cancel,
+                                endgame_cells=endgame_cells)[0]
+            evaluator.undo(board)
+            if new_score < value:
+                value = new_score
+                column = col
+            beta = min(beta, value)
+            if beta <= alpha:
+                if stats is not None:
+                    stats.cutoffs[i] += 1
+                break
+            i += 1
+
+    if table is not None:
+        if value <= alpha_orig:
+            flag = UPPER
+        elif value >= beta_orig:
+            flag = LOWER
+        else:
+            flag = EXACT
+        table.store(key, depth, flag, value, board.mirror_move(column) if mirrored else column)
+    return value, column
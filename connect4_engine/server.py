@@ -0,0 +1,334 @@
+# Headless game server: many concurrent matches over line-delimited JSON
+#
+#   python -m connect4_engine.server serve --port 8765 --workers 4
+#   python -m connect4_engine.server play --port 8765 --games 2000 --concurrency 1000
+#
+# Every request and reply is one JSON object on one line; columns and rows are
+# 0-based, with row 0 at the bottom. A connection can run several games.
+#
+#   {"op": "new", "ai": "minimax:5", "ai_first": false, "variant": "6x7x4"}
+#     -> {"op": "new", "game": 1, "rows": 6, "cols": 7, "connect": 4, "ai": "minimax:5", "ai_player": 2}
+#   {"op": "move", "game": 1, "col": 3}
+#     -> {"op": "move", "game": 1, "player": 1, "col": 3, "row": 0, "status": "playing"}
+#     -> the AI's answer, as a second "move" line, in games against the AI
+#   {"op": "state", "game": 1}
+#     -> {"op": "state", "game": 1, "moves": [3, 3], "board": [[...], ...], "to_move": 1, "status": "playing"}
+#   {"op": "close", "game": 1}
+#     -> {"op": "close", "game": 1}
+#
+# "ai" is an arena agent spec, or null for a game where the client makes the
+# moves of both players; the reply gives it in its canonical spelling. A
+# finished game has status "won", with "winner" and the winning "cells", or
+# "draw". A bad request gets {"op": "error", ...} and leaves its game
+# unchanged, as does an AI move that fails. Moves are checked with the same
+# rules as the GUI, and the AI's searches run in a process pool so the event
+# loop is never blocked by them.
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .arena import make_agent, parse_spec
+from .bitboard import (
+    PLAYER1,
+    PLAYER2,
+    STANDARD,
+    Position,
+    drop_piece,
+    get_next_open_row,
+    is_tie,
+    is_valid_location,
+    parse_variant,
+    winning_move,
+)
+from .endgame import ENDGAME_CELLS
+
+DEFAULT_AI = "minimax:5"
+# Limits that bound the memory and CPU time a client can take
+MAX_LINE = 4096
+MAX_GAMES_PER_CONNECTION = 16
+MAX_CELLS = 100
+MAX_AI_DEPTH = 8
+MAX_AI_MS = 2000
+IDLE_TIMEOUT = 600
+# Agents a worker process keeps between moves
+WORKER_AGENTS = 4
+
+
+# Check an agent spec without building the agent; returns it in its one
+# canonical spelling (budgets in whole milliseconds), so that specs meaning
+# the same agent share one in the workers
+def check_ai(spec):
+    name, value, weights_path = parse_spec(spec)
+    # Weights files are not read on behalf of clients
+    if not weights_path:
+        if name == "random":
+            return name
+        if name == "minimax" and value <= MAX_AI_DEPTH:
+            return "%s:%d" % (name, value)
+        if name in ("solver", "timed") and 1 <= round(value) <= MAX_AI_MS:
+            return "%s:%d" % (name, round(value))
+    raise ValueError("unsupported ai %r" % spec)
+
+
+# Agent of a worker process, kept between moves so its table stays warm; each
+# holds a table of several MB, so only the most recently used are kept
+@functools.lru_cache(maxsize=WORKER_AGENTS)
+def worker_agent(spec, variant):
+    return make_agent(spec, endgame_cells=ENDGAME_CELLS)
+
+
+# Choose the AI's move in a worker process
+def choose_move(spec, variant, moves):
+    board = Position(variant)
+    for col in moves:
+        board.play(col)
+    return worker_agent(spec, variant).choose(board)
+
+
+class Match:
+    def __init__(self, game_id, variant, ai=None, ai_player=None):
+        self.id = game_id
+        self.board = Position(variant)
+        self.ai = ai
+        self.ai_player = ai_player
+        self.status = "playing"
+        self.winner = None
+        self.cells = None
+        self.thinking = False
+
+    def ai_to_move(self):
+        return self.ai is not None and self.status == "playing" and self.board.side == self.ai_player
+
+    # Play a column for the player to move; returns the reply
+    def play(self, col):
+        board = self.board
+        if self.status != "playing":
+            raise ValueError("game %d is over" % self.id)
+        if not isinstance(col, int) or isinstance(col, bool) or not 0 <= col < board.variant.cols or not is_valid_location(board, col):
+            raise ValueError("column %r cannot be played" % (col,))
+        piece = board.side
+        row = get_next_open_row(board, col)
+        drop_piece(board, row, col, piece)
+        won, cells = winning_move(board, piece)
+        if won:
+            self.status = "won"
+            self.winner = piece
+            self.cells = cells
+        elif is_tie(board):
+            self.status = "draw"
+        reply = {"op": "move", "game": self.id, "player": piece, "col": col, "row": row}
+        reply.update(self.result())
+        return reply
+
+    def result(self):
+        if self.status == "won":
+            return {"status": "won", "winner": self.winner, "cells": self.cells}
+        return {"status": self.status}
+
+    def state(self):
+        board = self.board
+        reply = {"op": "state", "game": self.id, "moves": board.history,
+                 "board": [list(board[r]) for r in range(board.variant.rows)], "to_move": board.side}
+        reply.update(self.result())
+        return reply
+
+
+class GameServer:
+    def __init__(self, workers=None, default_ai=DEFAULT_AI):
+        # Spawned rather than forked workers, so they do not inherit the
+        # sockets of open connections and keep them from closing
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+        self.default_ai = default_ai
+        self.ids = itertools.count(1)
+        self.connections = 0
+        self.games = 0
+        self.ai_moves = 0
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        matches = {}
+        tasks = set()
+        try:
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), IDLE_TIMEOUT)
+                except (asyncio.TimeoutError, ValueError, ConnectionError):
+                    # Idle, sent a line longer than MAX_LINE or went away
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("request is not an object")
+                    replies = self.dispatch(request, matches)
+                except (ValueError, TypeError) as e:
+                    replies = [{"op": "error", "message": str(e)}]
+                for reply in replies:
+                    writer.write(json.dumps(reply).encode() + b"\n")
+                # Start the AI's answer without waiting for it
+                for match in matches.values():
+                    if match.ai_to_move() and not match.thinking:
+                        match.thinking = True
+                        task = asyncio.create_task(self.ai_move(match, writer))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                await writer.drain()
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.connections -= 1
+            self.games -= len(matches)
+            writer.close()
+
+    def dispatch(self, request, matches):
+        op = request.get("op")
+        if op == "new":
+            if len(matches) >= MAX_GAMES_PER_CONNECTION:
+                raise ValueError("too many games on one connection")
+            variant = parse_variant(str(request["variant"]), MAX_CELLS) if request.get("variant") else STANDARD
+            ai = request.get("ai", self.default_ai)
+            if ai is not None:
+                ai = check_ai(str(ai))
+            ai_player = PLAYER1 if request.get("ai_first") else PLAYER2
+            match = Match(next(self.ids), variant, ai, ai_player if ai is not None else None)
+            matches[match.id] = match
+            self.games += 1
+            return [{"op": "new", "game": match.id, "rows": variant.rows, "cols": variant.cols,
+                     "connect": variant.connect, "ai": ai, "ai_player": match.ai_player}]
+        match = matches.get(request.get("game"))
+        if match is None:
+            raise ValueError("no game %r" % (request.get("game"),))
+        if op == "move":
+            if match.thinking or match.ai_to_move():
+                raise ValueError("not your turn")
+            return [match.play(request.get("col"))]
+        if op == "state":
+            return [match.state()]
+        if op == "close":
+            del matches[match.id]
+            self.games -= 1
+            return [{"op": "close", "game": match.id}]
+        raise ValueError("unknown op %r" % (op,))
+
+    async def ai_move(self, match, writer):
+        loop = asyncio.get_running_loop()
+        board = match.board
+        try:
+            col = await loop.run_in_executor(self.executor, choose_move, match.ai, board.variant, board.history[:])
+            self.ai_moves += 1
+            reply = match.play(col)
+        except Exception as e:
+            # A broken pool or a failed search; the client still gets an answer
+            reply = {"op": "error", "game": match.id, "message": "ai move failed: %s" % (str(e) or type(e).__name__)}
+        finally:
+            match.thinking = False
+        writer.write(json.dumps(reply).encode() + b"\n")
+        await writer.drain()
+
+    async def serve(self, host, port):
+        # Start the workers before the first game needs one
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.executor, os.getpid) for _ in range(self.workers)))
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_LINE, backlog=4096)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+# Local test client: play one game of random moves against the server's AI
+async def play_one(host, port, ai, rng):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def send(request):
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+
+    async def receive():
+        reply = json.loads(await reader.readline())
+        if reply["op"] == "error":
+            raise RuntimeError(reply["message"])
+        return reply
+
+    try:
+        await send({"op": "new", "ai": ai, "ai_first": rng.random() < 0.5})
+        game = await receive()
+        board = Position()
+        status = "playing"
+        while status == "playing":
+            if board.side != game["ai_player"]:
+                await send({"op": "move", "game": game["game"], "col": rng.choice(board.valid_moves())})
+            reply = await receive()
+            board.play(reply["col"])
+            status = reply["status"]
+        return board.moves
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+# Play many games at once against a server; returns (games, moves, errors, seconds)
+async def run_clients(host, port, games, concurrency, ai, seed=0):
+    slots = asyncio.Semaphore(concurrency)
+    errors = []
+
+    async def one(game):
+        async with slots:
+            try:
+                return await play_one(host, port, ai, random.Random(seed * 1000003 + game))
+            except (OSError, RuntimeError, ValueError) as e:
+                errors.append(e)
+                return 0
+
+    start = time.perf_counter()
+    moves = await asyncio.gather(*(one(game) for game in range(games)))
+    return games, sum(moves), errors, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve connect 4 games over line-delimited JSON, or load-test a server.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    serve = commands.add_parser("serve", help="run the server")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--workers", type=int, default=None, help="search processes (default: CPU count)")
+    serve.add_argument("--ai", default=DEFAULT_AI, help="AI for games that do not name one")
+    play = commands.add_parser("play", help="play random moves against a running server")
+    play.add_argument("--host", default="127.0.0.1")
+    play.add_argument("--port", type=int, default=8765)
+    play.add_argument("--games", type=int, default=100)
+    play.add_argument("--concurrency", type=int, default=100, help="games in progress at once")
+    play.add_argument("--ai", default="minimax:2")
+    play.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        server = GameServer(args.workers, args.ai)
+        print("listening on %s:%d" % (args.host, args.port))
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
+    else:
+        games, moves, errors, seconds = asyncio.run(
+            run_clients(args.host, args.port, args.games, args.concurrency, args.ai, args.seed))
+        print("%d games, %d moves, %d errors in %.1f s (%.0f moves/s)" % (
+            games, moves, len(errors), seconds, moves / seconds if seconds else 0.0))
+        for error in errors[:5]:
+            print("error: %s" % error)
+
+
+if __name__ == "__main__":
+    main()
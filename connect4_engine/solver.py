@@ -0,0 +1,237 @@
+# Perfect-play solver: negamax with alpha-beta pruning
+#
+# Scores follow the usual convention: a positive score means the player to
+# move wins, and a win with the last stone of the board counts as 1, a win
+# one move earlier as 2, and so on; 0 is a draw. Internally every exact score
+# is multiplied by SCALE so that depth-limited searches can return heuristic
+# estimates strictly between two exact scores when running against a deadline.
+import time
+
+from .bitboard import STANDARD
+from .evaluate import score_position
+from .search import SearchCancelled
+from .threats import non_losing_moves
+from .tt import EXACT, LOWER, UPPER, TranspositionTable
+
+# Cells and center-first column order of the standard board; other variants
+# use those of board.variant
+CELLS = STANDARD.cells
+MOVE_ORDER = STANDARD.move_order
+SCALE = 1000
+# How many nodes to search between two looks at the clock (a power of two);
+# the solver searches some 50k nodes a second, so this is about a millisecond
+CLOCK_INTERVAL = 64
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+# Score of winning right now for the player to move
+def win_score(board):
+    return (board.variant.cells + 1 - board.moves) // 2
+
+
+# Moves of the player to move, best first: most new winning cells, then center
+# first. Only moves in the allowed mask are returned, if one is given.
+def ordered_moves(board, first=None, allowed=None):
+    variant = board.variant
+    scored = []
+    for col in variant.move_order:
+        if board.heights[col] < variant.rows:
+            move = (board.mask + variant.bottom_bit(col)) & variant.column_mask(col)
+            if allowed is not None and not move & allowed:
+                continue
+            threats = (variant.winning_cells(board.current | move, board.mask | move)).bit_count()
+            scored.append((col != first, -threats, len(scored), col))
+    scored.sort()
+    return [entry[3] for entry in scored]
+
+
+# Table keys do not include the variant, so a solver (or its table) should
+# only be used for positions of one variant
+class Solver:
+    def __init__(self, table=None):
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0
+        self.deadline = None
+        self.cancel = None
+
+    # Abort the search if it was cancelled or its deadline has passed
+    def check_clock(self):
+        if self.cancel is not None and self.cancel.is_set():
+            raise SearchCancelled()
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+    # Heuristic value of an unfinished position, strictly between -SCALE and SCALE
+    def estimate(self, board):
+        score = score_position(board, board.side)
+        return max(-SCALE + 1, min(SCALE - 1, score))
+
+    # Negamax value of a position in which the player to move cannot win at once
+    # with a stone; depth None searches to the end of the game
+    def negamax(self, board, alpha, beta, depth=None):
+        self.nodes += 1
+        if not self.nodes & (CLOCK_INTERVAL - 1):
+            self.check_clock()
+        if board.can_win_next():
+            return win_score(board) * SCALE
+        # Only moves that do not let the opponent win at once are searched
+        cells = board.variant.cells
+        safe = non_losing_moves(board)
+        if not safe:
+            return -((cells - board.moves) // 2) * SCALE
+        if board.moves >= cells - 2:
+            return 0
+        if depth == 0:
+            return self.estimate(board)
+
+        # The opponent cannot win before their second stone from now, which bounds the score
+        low = -((cells - 2 - board.moves) // 2) * SCALE
+        high = ((cells - 1 - board.moves) // 2) * SCALE
+        alpha = max(alpha, low)
+        beta = min(beta, high)
+        if alpha >= beta:
+            return alpha
+
+        # A position and its mirror image share an entry; its move is stored
+        # as played on the board the key belongs to
+        key, mirrored = board.canonical_key()
+        # Searches to the end of the game are stored deeper than any limited one
+        remaining = cells + 1 if depth is None else depth
+        first = None
+        entry = self.table.lookup(key)
+        if entry is not None:
+            entry_depth, flag, value, first = entry
+            if mirrored and first is not None:
+                first = board.mirror_move(first)
+            if entry_depth >= remaining:
+                if flag == EXACT:
+                    return value
+                if flag == LOWER and value > alpha:
+                    alpha = value
+                elif flag == UPPER and value < beta:
+                    beta = value
+                if alpha >= beta:
+                    return value
+
+        alpha_orig = alpha
+        child_depth = None if depth is None else depth - 1
+        best_move = None
+        for col in ordered_moves(board, first, safe):
+            board.play(col)
+            score = -self.negamax(board, -beta, -alpha, child_depth)
+            board.undo()
+            if score >= beta:
+                self.table.store(key, remaining, LOWER, score, board.mirror_move(col) if mirrored else col)
+                return score
+            if score > alpha:
+                alpha = score
+                best_move = col
+        if mirrored and best_move is not None:
+            best_move = board.mirror_move(best_move)
+        self.table.store(key, remaining, EXACT if alpha > alpha_orig else UPPER, alpha, best_move)
+        return alpha
+
+    # Exact value of a position, found with a sequence of null-window searches
+    def solve(self, board):
+        cells = board.variant.cells
+        if board.can_win_next():
+            return win_score(board)
+        if board.moves >= cells - 1:
+            return 0
+        low = -((cells - board.moves) // 2)
+        high = (cells + 1 - board.moves) // 2
+        while low < high:
+            mid = low + (high - low) // 2
+            # Probe closer to zero first, where most positions lie
+            if mid <= 0 and low // 2 < mid:
+                mid = low // 2
+            elif mid >= 0 and high // 2 > mid:
+                mid = high // 2
+            result = self.negamax(board, mid * SCALE, mid * SCALE + 1)
+            if result <= mid * SCALE:
+                high = result // SCALE
+            else:
+                low = -(-result // SCALE)
+        return low
+
+    # Exact value and a move achieving it
+    def solve_move(self, board):
+        for col in board.variant.move_order:
+            if board.can_play(col) and board.is_winning_move(col):
+                return win_score(board), col
+        value = self.solve(board)
+        for col in ordered_moves(board):
+            board.play(col)
+            # Child value at most -value means this move keeps the value
+            result = self.negamax(board, -value * SCALE, -value * SCALE + 1)
+            board.undo()
+            if result <= -value * SCALE:
+                return value, col
+        return value, None
+
+    # Principal variation search at the root, to a fixed depth
+    def search_root(self, board, depth, first=None):
+        # An iteration does not start once the deadline has passed
+        self.check_clock()
+        alpha = -board.variant.cells * SCALE
+        beta = board.variant.cells * SCALE
+        best_move = None
+        for i, col in enumerate(ordered_moves(board, first)):
+            board.play(col)
+            if i == 0:
+                score = -self.negamax(board, -beta, -alpha, depth - 1)
+            else:
+                # Scout with a null window and only re-search moves that beat the best one
+                score = -self.negamax(board, -alpha - 1, -alpha, depth - 1)
+                if score > alpha:
+                    score = -self.negamax(board, -beta, -alpha, depth - 1)
+            board.undo()
+            if best_move is None or score > alpha:
+                alpha = score
+                best_move = col
+        return alpha, best_move
+
+    # Best move found before the deadline, by iterative deepening. Returns
+    # (value, column, exact); value is in exact score units, and is only a
+    # heuristic estimate between -1 and 1 when exact is False. Setting the
+    # threading.Event passed as cancel aborts with SearchCancelled.
+    def best_move(self, board, time_ms=None, cancel=None):
+        for col in board.variant.move_order:
+            if board.can_play(col) and board.is_winning_move(col):
+                return win_score(board), col, True
+        self.cancel = cancel
+        if time_ms is None:
+            try:
+                value, col = self.solve_move(board)
+            finally:
+                self.cancel = None
+            return value, col, True
+
+        self.deadline = time.perf_counter() + time_ms / 1000
+        moves = board.moves
+        result = (0, ordered_moves(board)[0], False)
+        try:
+            empty = board.variant.cells - board.moves
+            for depth in range(1, empty + 1):
+                score, col = self.search_root(board, depth, result[1])
+                exact = abs(score) >= SCALE or depth >= empty
+                result = (score // SCALE if exact else score / SCALE, col, exact)
+                if exact:
+                    break
+        except SearchTimeout:
+            # Take back the moves of the interrupted search
+            while board.moves > moves:
+                board.undo()
+        finally:
+            self.deadline = None
+            self.cancel = None
+        return result
+
+
+# Exact value and best move of a position
+def solve(board, time_ms=None, table=None):
+    value, col, exact = Solver(table).best_move(board, time_ms)
+    return value, col
@@ -0,0 +1,76 @@
+# Optional instrumentation for the search
+#
+#   stats = SearchStats()
+#   with stats:
+#       minimax(board, depth, -math.inf, math.inf, True, piece, table, stats=stats)
+#   print(stats.summary())
+import time
+from collections import Counter
+
+
+class SearchStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Nodes visited, keyed by remaining depth
+        self.nodes = Counter()
+        # Alpha-beta cutoffs, keyed by the index of the move that caused them
+        self.cutoffs = Counter()
+        self.table_hits = 0
+        self.leaf_evals = 0
+        # Positions given their exact value by the endgame memo or solver
+        self.endgame_solves = 0
+        self.seconds = 0.0
+        self.started = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds += time.perf_counter() - self.started
+        self.started = None
+
+    def total_nodes(self):
+        return sum(self.nodes.values())
+
+    def summary(self):
+        nodes = self.total_nodes()
+        cutoffs = sum(self.cutoffs.values())
+        return {
+            "nodes": nodes,
+            "nodes_by_depth": dict(sorted(self.nodes.items(), reverse=True)),
+            "cutoffs": cutoffs,
+            "cutoffs_by_move_index": dict(sorted(self.cutoffs.items())),
+            # Share of cutoffs produced by the first move tried; high means good move ordering
+            "first_move_cutoff_rate": self.cutoffs[0] / cutoffs if cutoffs else 0.0,
+            "table_hits": self.table_hits,
+            "leaf_evals": self.leaf_evals,
+            "endgame_solves": self.endgame_solves,
+            "seconds": self.seconds,
+            "nodes_per_sec": nodes / self.seconds if self.seconds else 0.0,
+        }
+
+    # One line for logs
+    def log_line(self):
+        s = self.summary()
+        return "nodes=%d cutoffs=%d first_cut=%.2f tt_hits=%d leaves=%d endgame=%d time=%.3fs nps=%.0f" % (
+            s["nodes"], s["cutoffs"], s["first_move_cutoff_rate"], s["table_hits"], s["leaf_evals"],
+            s["endgame_solves"], s["seconds"], s["nodes_per_sec"])
+
+
+# Run one search under cProfile. The profile is written to path (for
+# pstats/snakeviz) if given; the search result and a text report are returned.
+def profile_search(search, *args, path=None, sort="cumulative", limit=30, **kwargs):
+    # Imported here so that the profiler only loads when it is used
+    import cProfile
+    import io
+    import pstats
+    profiler = cProfile.Profile()
+    result = profiler.runcall(search, *args, **kwargs)
+    if path is not None:
+        profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return result, out.getvalue()
@@ -0,0 +1,77 @@
+# Threat analysis on bitboards
+#
+# A threat is an empty cell that would complete a line for one player.
+# Threats in cells that can be played right now are immediate wins (for the
+# player to move) or forced blocks (for the opponent). Playing directly below
+# an opponent's threat lets them play into it, so such moves are never safe.
+from .bitboard import STANDARD
+
+
+# Threat cells of the player to move
+def own_threats(board):
+    return board.variant.winning_cells(board.current, board.mask)
+
+
+# Threat cells of the opponent of the player to move
+def opponent_threats(board):
+    return board.variant.winning_cells(board.current ^ board.mask, board.mask)
+
+
+# Cells the player to move can play to win at once
+def immediate_wins(board):
+    return own_threats(board) & board.legal_moves()
+
+
+# Cells the player to move must play to stop the opponent winning next move
+def forced_blocks(board):
+    return opponent_threats(board) & board.legal_moves()
+
+
+# Cells the player to move can play without letting the opponent win on the
+# next move; 0 means every move loses (e.g. against a double threat).
+# Assumes the player to move cannot win at once.
+def non_losing_moves(board):
+    possible = board.legal_moves()
+    threats = opponent_threats(board)
+    forced = possible & threats
+    if forced:
+        if forced & (forced - 1):
+            return 0
+        possible = forced
+    return possible & ~(threats >> 1)
+
+
+# Threat cells stacked directly on another threat cell of the same player;
+# once the lower cell becomes playable, that player wins in this column
+def stacked_threats(threats):
+    return threats & (threats << 1)
+
+
+# Check whether the opponent has two immediate wins, which cannot both be blocked
+def facing_double_threat(board):
+    forced = forced_blocks(board)
+    return bool(forced & (forced - 1))
+
+
+# Columns of the cells in a mask, left to right
+def mask_columns(mask, variant=STANDARD):
+    height = variant.column_height
+    column_bits = (1 << height) - 1
+    return [c for c in range(variant.cols) if (mask >> (c * height)) & column_bits]
+
+
+# Summary of both players' threats, as columns, for the player to move
+def analyze(board):
+    variant = board.variant
+    wins = immediate_wins(board)
+    safe = board.legal_moves() if wins else non_losing_moves(board)
+    return {
+        "immediate_wins": mask_columns(wins, variant),
+        "forced_blocks": mask_columns(forced_blocks(board), variant),
+        "facing_double_threat": facing_double_threat(board),
+        "safe_moves": mask_columns(safe, variant),
+        "own_threats": own_threats(board).bit_count(),
+        "opponent_threats": opponent_threats(board).bit_count(),
+        "own_stacked_threats": mask_columns(stacked_threats(own_threats(board)), variant),
+        "opponent_stacked_threats": mask_columns(stacked_threats(opponent_threats(board)), variant),
+    }
@@ -0,0 +1,125 @@
+# Time-managed minimax: iterative deepening against a deadline
+#
+# Each iteration searches one ply deeper than the last with the same
+# transposition table. minimax tries the best move stored in the table first
+# at every node, so the moves found by the shallower iterations order the
+# search of the deeper ones. The clock is read at every node, and by the
+# endgame solver every few dozen of its own nodes; when the deadline passes,
+# the running iteration is dropped and the result of the last completed one
+# is returned.
+import math
+import time
+
+from .endgame import ENDGAME_CELLS
+from .evaluate import DEFAULT_WEIGHTS
+from .search import WIN_SCORE, SearchCancelled, minimax, table_key
+from .tt import TranspositionTable
+
+# No new iteration is started once this share of the budget is used up, as
+# it would most likely not finish in time
+START_FRACTION = 0.5
+
+
+# Stands in for minimax's cancel event: set once the deadline (a
+# time.perf_counter() value) has passed or the wrapped cancel event is set.
+# The clock is read on every call, which costs far less than a node; the
+# endgame solver, which polls it less often, would otherwise miss the deadline.
+class Deadline:
+    def __init__(self, end, cancel=None):
+        self.end = end
+        self.cancel = cancel
+        self.expired = False
+
+    def is_set(self):
+        if self.expired or self.cancel is not None and self.cancel.is_set():
+            return True
+        self.expired = time.perf_counter() >= self.end
+        return self.expired
+
+
+# Moves of the principal variation stored in a table, from a position; the
+# line the last search expects, for reporting (the GUI prints it with AI_STATS)
+def principal_variation(board, table, piece, max_length):
+    board = board.copy()
+    moves = []
+    while len(moves) < max_length:
+        key, mirrored = table_key(board, piece)
+        entry = table.lookup(key)
+        if entry is None or entry[3] is None:
+            break
+        col = board.mirror_move(entry[3]) if mirrored else entry[3]
+        if not board.can_play(col):
+            break
+        board.play(col)
+        moves.append(col)
+        if board.last_move_won():
+            break
+    return moves
+
+
+# Best move found within time_ms milliseconds, for the player to move unless
+# piece says otherwise. Returns (value, column, depth) like minimax plus the
+# depth of the last completed iteration, which is at least 1. Positions with
+# up to ENDGAME_CELLS empty cells are solved exactly. Setting the
+# threading.Event passed as cancel aborts with SearchCancelled.
+def timed_minimax(board, time_ms, piece=None, table=None, max_depth=None, stats=None, cancel=None,
+                  weights=DEFAULT_WEIGHTS):
+    start = time.perf_counter()
+    budget = time_ms / 1000
+    if piece is None:
+        piece = board.side
+    if table is None:
+        table = TranspositionTable()
+    maximizing = board.side == piece
+    empty = board.variant.cells - board.moves
+    max_depth = empty if max_depth is None else min(max_depth, empty)
+
+    # Depth 1 always runs to the end, so there is a move to return; endgames
+    # are only solved by the later iterations, which the deadline interrupts
+    value, column = minimax(board, 1, -math.inf, math.inf, maximizing, piece, table, stats=stats, cancel=cancel,
+                            weights=weights)
+    depth = 1
+    deadline = Deadline(start + budget, cancel)
+    moves = board.moves
+    # A forced result will not change with more depth
+    while depth < max_depth and abs(value) < WIN_SCORE and time.perf_counter() - start < budget * START_FRACTION:
+        try:
+            value, column = minimax(board, depth + 1, -math.inf, math.inf, maximizing, piece, table,
+                                    stats=stats, cancel=deadline, weights=weights, endgame_cells=ENDGAME_CELLS)
+        except SearchCancelled:
+            # Take back the moves of the interrupted iteration
+            while board.moves > moves:
+                board.undo()
+            if deadline.expired:
+                break
+            raise
+        depth += 1
+    return value, column, depth
+
+
+# Time budgets for one player: milliseconds per move, for all of their moves
+# in a game, or both (each move then gets the smaller of the two)
+class TimeControl:
+    def __init__(self, move_ms=None, game_ms=None):
+        if move_ms is None and game_ms is None:
+            raise ValueError("a time control needs a budget per move or per game")
+        self.move_ms = move_ms
+        self.game_ms = game_ms
+        self.reset()
+
+    # Start a new game
+    def reset(self):
+        self.remaining_ms = self.game_ms
+
+    # Milliseconds for the next move of the player to move; the game budget
+    # left is split evenly over the moves they may still have to make
+    def budget(self, board):
+        budget = math.inf if self.move_ms is None else self.move_ms
+        if self.remaining_ms is not None:
+            moves_left = (board.variant.cells - board.moves + 1) // 2
+            budget = min(budget, self.remaining_ms / max(1, moves_left))
+        return budget
+
+    def spend(self, ms):
+        if self.remaining_ms is not None:
+            self.remaining_ms = max(0.0, self.remaining_ms - ms)
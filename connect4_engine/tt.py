@@ -0,0 +1,93 @@
+# Fixed-size transposition table for the search
+#
+# Every bucket has two slots: a depth-preferred slot that only gives way to
+# searches at least as deep, and an always-replace slot that takes everything
+# else, so shallow results near the leaves cannot flush out expensive ones.
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Rough size of one stored entry (tuple plus its ints) in bytes
+ENTRY_BYTES = 160
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# Multiplier for Fibonacci hashing of position keys into buckets
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_MASK = (1 << 64) - 1
+
+
+class TranspositionTable:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        # Round down to a power of two so the bucket index is the top bits of the hash
+        bits = max(1, (max_bytes // (2 * ENTRY_BYTES)).bit_length() - 1)
+        self.buckets = 1 << bits
+        self.shift = 64 - bits
+        self.clear()
+
+    def clear(self):
+        self.deep = [None] * self.buckets
+        self.recent = [None] * self.buckets
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    def index(self, key):
+        return ((key * HASH_MULTIPLIER) & HASH_MASK) >> self.shift
+
+    # Return (depth, flag, value, move) for a key, or None
+    def lookup(self, key):
+        index = self.index(key)
+        entry = self.deep[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1:]
+        entry = self.recent[index]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry[1:]
+        self.misses += 1
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        index = self.index(key)
+        entry = (key, depth, flag, value, move)
+        self.stores += 1
+        deep = self.deep[index]
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            if deep is not None and deep[0] != key:
+                self.evictions += 1
+            self.deep[index] = entry
+        else:
+            if self.recent[index] is not None and self.recent[index][0] != key:
+                self.evictions += 1
+            self.recent[index] = entry
+
+    # Stored (key, depth, flag, value, move) tuples, for copying between processes
+    def entries(self, min_depth=0):
+        for slot in (self.deep, self.recent):
+            for entry in slot:
+                if entry is not None and entry[1] >= min_depth:
+                    yield entry
+
+    def merge(self, entries):
+        for entry in entries:
+            self.store(*entry)
+
+    def __len__(self):
+        return sum(entry is not None for entry in self.deep) + sum(entry is not None for entry in self.recent)
+
+    def hit_rate(self):
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0
+
+    def stats(self):
+        return {
+            "buckets": self.buckets,
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate(),
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
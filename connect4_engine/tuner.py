@@ -0,0 +1,292 @@
+# Offline tuning of the evaluation weights
+#
+# Positions come from self-play by minimax after a short random opening. Each
+# is labelled with its exact value when the solver finds it within the time
+# budget, and otherwise with the result the self-play game went on to reach
+# (so positions too early to solve are still covered). Each position is scored
+# from both sides with the window features of evaluate.py, counted for the
+# whole batch at once with NumPy, and a logistic model of the outcome is fitted
+# to them. The fitted weights are scaled to small integers and written as JSON
+# for the engine (see the weights option of the arena's minimax agents and
+# AI_WEIGHTS in connect4_final.py):
+#
+#   python -m connect4_engine.tuner --games 2000 --label-ms 50 --workers 8 --save-positions positions.txt
+#   python -m connect4_engine.tuner --positions positions.txt --output weights.json --match-games 400
+#
+# A better fit to the outcomes does not always mean stronger play at a given
+# depth, so --match-games plays the new weights against the current ones.
+#
+# Only the standard 6x7 board is supported, like batch.py.
+import argparse
+import functools
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .batch import CENTER_INDEX, CODE_WEIGHTS, WINDOW_INDEX, positions_to_boards
+from .bitboard import PLAYER1, PLAYER2, Position, position_from_moves
+from .evaluate import DEFAULT_WEIGHTS, WINDOW_LENGTH, Weights, save_weights, window_score
+from .arena import run_tournament
+from .search import minimax
+from .solver import Solver
+from .tt import TranspositionTable
+
+# Games played and labelled by one worker task
+GAMES_PER_TASK = 20
+# Largest absolute weight after scaling the fitted ones to integers
+RESOLUTION = 10
+# Weights fitted from the data; the line weight never applies to a position
+# that is not already won, so it keeps its default
+FITTED = ("near", "far", "opponent_near", "center")
+LABEL_TABLE_BYTES = 16 * 1024 * 1024
+
+
+# Solver of a worker process, kept between tasks
+@functools.lru_cache(maxsize=None)
+def worker_solver():
+    return Solver(TranspositionTable(LABEL_TABLE_BYTES))
+
+
+# Play games from a seed and label their positions; returns (moves, value)
+# pairs, with the value for the player to move: the solver's score when it
+# was exact, otherwise 1, 0 or -1 for the game's result
+def play_and_label(seed, games, label_ms, play_depth, opening_plies):
+    rng = random.Random(seed)
+    table = TranspositionTable()
+    solver = worker_solver()
+    labelled = []
+    for _ in range(games):
+        board = Position()
+        opening = rng.randint(0, opening_plies)
+        played = []
+        winner = None
+        while not board.is_full():
+            if board.moves < opening:
+                col = rng.choice(board.valid_moves())
+            else:
+                col = minimax(board, play_depth, -math.inf, math.inf, True, board.side, table)[1]
+            if board.is_winning_move(col):
+                winner = board.side
+                break
+            board.play(col)
+            # Positions with a win on the board are settled, not evaluated
+            if board.is_full() or board.can_win_next():
+                continue
+            value, _, exact = solver.best_move(board, label_ms) if label_ms else (0, None, False)
+            played.append((board.move_string(), board.side, value if exact else None))
+        for moves, side, value in played:
+            if value is None:
+                value = 0 if winner is None else 1 if winner == side else -1
+            labelled.append((moves, value))
+    return labelled
+
+
+# Generate labelled positions in a process pool, without duplicates (a
+# position and its mirror image count as one)
+def generate_positions(games, label_ms, play_depth=4, opening_plies=8, workers=1, seed=0):
+    tasks = [(seed * 1000003 + start, min(GAMES_PER_TASK, games - start), label_ms, play_depth, opening_plies)
+             for start in range(0, games, GAMES_PER_TASK)]
+    if workers == 1:
+        results = (play_and_label(*task) for task in tasks)
+        return dedupe(results)
+    with ProcessPoolExecutor(workers) as executor:
+        return dedupe(executor.map(play_and_label, *zip(*tasks)))
+
+
+def dedupe(results):
+    seen = set()
+    positions = []
+    for labelled in results:
+        for moves, value in labelled:
+            key = position_from_moves(moves).canonical_key()[0]
+            if key not in seen:
+                seen.add(key)
+                positions.append((moves, value))
+    return positions
+
+
+# Labelled positions as lines of "MOVES VALUE", with - for no moves
+def write_positions(positions, path):
+    with open(path, "w") as f:
+        for moves, value in positions:
+            f.write("%s %d\n" % (moves or "-", value))
+
+
+def read_positions(path):
+    positions = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields) != 2:
+                raise ValueError("%s:%d: expected MOVES VALUE" % (path, number))
+            positions.append(("" if fields[0] == "-" else fields[0], int(fields[1])))
+    return positions
+
+
+# Window feature counts of every base-3 window code, for a piece, in the order
+# of Weights.FIELDS (the center count is added by board_features). Scoring a
+# window with one weight set to 1 and the rest to 0 gives its count of that
+# feature, so the features follow the engine's definition.
+def code_features(piece):
+    other = PLAYER1 + PLAYER2 - piece
+    codes = 3 ** WINDOW_LENGTH
+    one_hot = [(index, Weights(**{f: int(f == field) for f in Weights.FIELDS}))
+               for index, field in enumerate(Weights.FIELDS) if field != "center"]
+    features = np.zeros((codes, len(Weights.FIELDS)), dtype=np.int32)
+    for code in range(codes):
+        cells = [(code // 3 ** i) % 3 for i in range(WINDOW_LENGTH)]
+        own = cells.count(piece)
+        opp = cells.count(other)
+        for index, weights in one_hot:
+            features[code, index] = window_score(own, opp, WINDOW_LENGTH, weights)
+    return features
+
+
+CODE_FEATURES = {PLAYER1: code_features(PLAYER1), PLAYER2: code_features(PLAYER2)}
+
+
+# Feature counts of a batch of (N, ROWS, COLS) boards for a piece, shape
+# (N, len(Weights.FIELDS)); their dot product with a set of weights is
+# score_position with those weights
+def board_features(boards, piece):
+    boards = np.asarray(boards, dtype=np.int8).reshape(len(boards), -1)
+    codes = np.zeros((len(boards), len(WINDOW_INDEX)), dtype=np.intp)
+    for i in range(WINDOW_LENGTH):
+        codes += boards[:, WINDOW_INDEX[:, i]] * CODE_WEIGHTS[i]
+    features = CODE_FEATURES[piece][codes].sum(axis=1)
+    features[:, Weights.FIELDS.index("center")] = (boards[:, CENTER_INDEX] == piece).sum(axis=1)
+    return features
+
+
+# Design matrix and targets: each position gives one row for each player,
+# with the probability that player wins (draws count half) as the target.
+# The two extra columns are a constant and a flag for the player to move.
+def training_data(positions):
+    boards = positions_to_boards(position_from_moves(moves) for moves, _ in positions)
+    values = np.array([value for _, value in positions])
+    to_move = np.array([PLAYER1 if len(moves) % 2 == 0 else PLAYER2 for moves, _ in positions])
+    wins = np.where(values > 0, 1.0, np.where(values < 0, 0.0, 0.5))
+    rows = []
+    targets = []
+    for piece in (PLAYER1, PLAYER2):
+        features = board_features(boards, piece)
+        moving = to_move == piece
+        rows.append(np.column_stack([features, np.ones(len(boards)), moving]))
+        targets.append(np.where(moving, wins, 1.0 - wins))
+    return np.vstack(rows).astype(np.float64), np.concatenate(targets)
+
+
+def sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+# Logistic regression by Newton's method with a little L2 regularization;
+# targets may be fractional
+def fit_logistic(x, y, l2=1e-3, iterations=50):
+    w = np.zeros(x.shape[1])
+    for _ in range(iterations):
+        p = sigmoid(x @ w)
+        gradient = x.T @ (p - y) + l2 * w
+        hessian = (x * (p * (1 - p))[:, None]).T @ x + l2 * np.eye(x.shape[1])
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if np.abs(step).max() < 1e-9:
+            break
+    return w
+
+
+def log_loss(x, y, w):
+    p = np.clip(sigmoid(x @ w), 1e-12, 1 - 1e-12)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+# Columns of the design matrix used to score a set of weights: the
+# evaluation itself, the constant and the player-to-move flag
+def score_columns(x, weights):
+    fields = len(Weights.FIELDS)
+    return np.column_stack([x[:, :fields] @ np.array(weights.values(), dtype=np.float64), x[:, fields:]])
+
+
+# Held-out log loss of a set of weights, with the scale of the evaluation,
+# the constant and the tempo term fitted on the training rows
+def weights_loss(weights, train, test):
+    w = fit_logistic(score_columns(train[0], weights), train[1])
+    return log_loss(score_columns(test[0], weights), test[1], w)
+
+
+# Fit the weights in FITTED on the training rows and scale them to integers
+def fit_weights(x, y):
+    columns = [Weights.FIELDS.index(field) for field in FITTED]
+    extra = list(range(len(Weights.FIELDS), x.shape[1]))
+    coefficients = fit_logistic(x[:, columns + extra], y)[:len(columns)]
+    largest = np.abs(coefficients).max()
+    if not largest:
+        raise ValueError("the positions do not tell the weights apart")
+    scaled = np.rint(coefficients * RESOLUTION / largest).astype(int)
+    values = DEFAULT_WEIGHTS.to_dict()
+    values.update((field, int(value)) for field, value in zip(FITTED, scaled))
+    return Weights.from_dict(values)
+
+
+# Split the rows of both players of each position together, so a position
+# never ends up on both sides of the split
+def split(x, y, holdout, seed=0):
+    positions = len(y) // 2
+    test = np.random.default_rng(seed).random(positions) < holdout
+    test = np.concatenate([test, test])
+    return (x[~test], y[~test]), (x[test], y[test])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit the evaluation weights to self-play positions labelled by the solver.")
+    parser.add_argument("--games", type=int, default=1000, help="self-play games to take positions from")
+    parser.add_argument("--label-ms", type=float, default=50,
+                        help="solver time per position; unsolved ones take the game's result (0 for no solver)")
+    parser.add_argument("--play-depth", type=int, default=4, help="minimax depth of the self-play games")
+    parser.add_argument("--opening-plies", type=int, default=8, help="most random moves opening a self-play game")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (0 for the CPU count)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--positions", help="fit to labelled positions saved earlier instead of generating them")
+    parser.add_argument("--save-positions", help="write the labelled positions to this file")
+    parser.add_argument("--holdout", type=float, default=0.2, help="share of positions kept out of the fit")
+    parser.add_argument("--output", default="weights.json", help="weights file to write")
+    parser.add_argument("--match-games", type=int, default=0, help="games of the new weights against the current ones")
+    parser.add_argument("--match-depth", type=int, default=4)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.positions:
+        positions = read_positions(args.positions)
+    else:
+        positions = generate_positions(args.games, args.label_ms, args.play_depth, args.opening_plies,
+                                       args.workers or os.cpu_count(), args.seed)
+        print("%d positions labelled in %.1f s" % (len(positions), time.perf_counter() - start), file=sys.stderr)
+    if args.save_positions:
+        write_positions(positions, args.save_positions)
+    if not positions:
+        parser.error("no labelled positions")
+
+    x, y = training_data(positions)
+    train, test = split(x, y, args.holdout, args.seed)
+    weights = fit_weights(*train)
+    save_weights(weights, args.output)
+    print("weights: %s" % weights)
+    if len(test[1]):
+        print("held-out log loss: default %.4f, tuned %.4f" % (
+            weights_loss(DEFAULT_WEIGHTS, train, test), weights_loss(weights, train, test)))
+    if args.match_games:
+        specs = ["minimax:%d" % args.match_depth, "minimax:%d:%s" % (args.match_depth, args.output)]
+        pairing = run_tournament(specs, args.match_games, args.workers or None, args.seed)["pairings"][0]
+        print("default vs tuned at depth %d: +%d =%d -%d" % (
+            args.match_depth, pairing["wins"], pairing["draws"], pairing["losses"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+# Runs AI searches on a background thread so a UI loop can keep drawing
+#
+#   worker = AIWorker()
+#   worker.start(search, board)      # calls search(board_copy, cancel=event)
+#   ...each frame...
+#   if worker.done():
+#       result = worker.result()
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AIWorker:
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai")
+        self.future = None
+        self.cancel_event = None
+
+    # Start searching a copy of the board, cancelling any search still running
+    def start(self, search, board, *args):
+        self.cancel()
+        self.cancel_event = threading.Event()
+        self.future = self.executor.submit(search, board.copy(), *args, cancel=self.cancel_event)
+        return self.future
+
+    def busy(self):
+        return self.future is not None and not self.future.done()
+
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    # Result of the finished search (re-raising its error), and forget it
+    def result(self):
+        future, self.future = self.future, None
+        return future.result()
+
+    # Ask the running search to stop; its result is discarded
+    def cancel(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+        self.future = None
+        self.cancel_event = None
+
+    def shutdown(self):
+        self.cancel()
+        self.executor.shutdown(wait=True)
+
@@ -1,8 +1,20 @@
-import numpy as np
-import pygame
 import sys
 import math
 import random
+import time
+
+from connect4_engine import create_board, drop_piece, is_valid_location, get_next_open_row, winning_move
+from connect4_engine.book import load_book
+from connect4_engine.endgame import ENDGAME_CELLS
+from connect4_engine.evaluate import DEFAULT_WEIGHTS, load_weights
+from connect4_engine.ponder import Ponderer
+from connect4_engine.records import RecordWriter, record_from_position
+from connect4_engine.search import minimax
+from connect4_engine.solver import Solver
+from connect4_engine.stats import SearchStats
+from connect4_engine.timed import TimeControl, principal_variation, timed_minimax
+from connect4_engine.tt import TranspositionTable
+from connect4_engine.worker import AIWorker
 
 BLUE = (0, 0, 255)
 BLACK = (0, 0, 0)
@@ -13,95 +25,157 @@ WHITE = (255, 255, 255)
 ROW_COUNT = 6
 COLUMN_COUNT = 7
 
-def create_board():
-    board = np.zeros((ROW_COUNT, COLUMN_COUNT))
-    return board
-
-def drop_piece(board, row, col, piece):
-    board[row][col] = piece
-
-def is_valid_location(board, col):
-    return board[ROW_COUNT - 1][col] == 0
-
-def get_next_open_row(board, col):
-    for r in range(ROW_COUNT):
-        if board[r][col] == 0:
-            return r
+FPS = 60
+
+SQUARESIZE = 100
+width = COLUMN_COUNT * SQUARESIZE
+height = (ROW_COUNT + 1) * SQUARESIZE
+size = (width, height)
+RADIUS = int(SQUARESIZE / 2 - 5)
+
+AI_PIECE = 2
+AI_LEVEL = "normal"  # "normal" runs minimax, "hard" runs the solver; both think within the budgets below
+AI_TIME_MS = 1000  # Time budget per AI move
+AI_GAME_MS = None  # Time budget for all of the AI's moves in a game, e.g. 30000
+AI_DEPTH = None  # Fixed minimax depth to use instead of the time budgets, e.g. 6
+AI_WEIGHTS = None  # Evaluation weights file written by connect4_engine.tuner, e.g. "weights.json"
+AI_STATS = False  # Print search statistics after every AI move
+AI_MIN_DELAY_MS = 1000  # The AI never answers faster than this, so its move can be followed
+AI_PONDER = True  # Search the AI's replies while the player is thinking
+TABLE_BYTES = 64 * 1024 * 1024  # Memory cap for the AI's transposition table
+GAME_LOG = None  # Record file finished games are appended to, e.g. "games.txt.gz"
+
+# pygame, the window and the AI are only set up by main(), so the module can be
+# imported (e.g. by worker processes) without opening a window
+pygame = None
 
 def print_board(board):
-    print(np.flip(board, 0))
-
-def winning_move(board, piece):
-    # Check horizontal locations for win
-    for c in range(COLUMN_COUNT - 3):
+    import numpy as np
+    print(np.flip(board.to_array(), 0))
+
+# Draws the window from pre-rendered surfaces and only pushes the parts that
+# changed to the display
+class Renderer:
+    def __init__(self, screen):
+        self.screen = screen
+        self.header_rect = pygame.Rect(0, 0, width, SQUARESIZE)
+        # Empty board, rendered once
+        self.background = pygame.Surface((width, height - SQUARESIZE))
+        self.background.fill(BLUE)
+        for c in range(COLUMN_COUNT):
+            for r in range(ROW_COUNT):
+                pygame.draw.circle(self.background, BLACK, (int(c * SQUARESIZE + SQUARESIZE / 2), int(r * SQUARESIZE + SQUARESIZE / 2)), RADIUS)
+        self.sprites = {1: self.make_sprite(RED), 2: self.make_sprite(YELLOW)}
+        self.fonts = {}
+        self.labels = {}
+        self.drawn = None  # Pieces currently on screen; None means the board must be redrawn
+        self.scores = None  # Scores currently in the header; None means the header must be redrawn
+
+    def make_sprite(self, color):
+        sprite = pygame.Surface((SQUARESIZE, SQUARESIZE), pygame.SRCALPHA)
+        pygame.draw.circle(sprite, color, (SQUARESIZE // 2, SQUARESIZE // 2), RADIUS)
+        return sprite
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont("monospace", size)
+        return self.fonts[size]
+
+    def label(self, text, size, color):
+        key = (text, size, color)
+        if key not in self.labels:
+            self.labels[key] = self.font(size).render(text, 1, color)
+        return self.labels[key]
+
+    def cell_rect(self, r, c):
+        return pygame.Rect(c * SQUARESIZE, height - (r + 1) * SQUARESIZE, SQUARESIZE, SQUARESIZE)
+
+    # Force a full redraw of the board on the next draw_board
+    def invalidate(self):
+        self.drawn = None
+        self.scores = None
+
+    def draw_board(self, board):
+        dirty = []
+        if self.drawn is None:
+            self.screen.blit(self.background, (0, SQUARESIZE))
+            self.drawn = [[0] * COLUMN_COUNT for _ in range(ROW_COUNT)]
+            dirty.append(pygame.Rect(0, SQUARESIZE, width, height - SQUARESIZE))
         for r in range(ROW_COUNT):
-            if board[r][c] == piece and board[r][c + 1] == piece and board[r][c + 2] == piece and board[r][c + 3] == piece:
-                return True, [(r, c), (r, c + 1), (r, c + 2), (r, c + 3)]
-
-    # Check vertical locations for win
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT - 3):
-            if board[r][c] == piece and board[r + 1][c] == piece and board[r + 2][c] == piece and board[r + 3][c] == piece:
-                return True, [(r, c), (r + 1, c), (r + 2, c), (r + 3, c)]
-
-    # Check positively sloped diagonals
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(ROW_COUNT - 3):
-            if board[r][c] == piece and board[r + 1][c + 1] == piece and board[r + 2][c + 2] == piece and board[r + 3][c + 3] == piece:
-                return True, [(r, c), (r + 1, c + 1), (r + 2, c + 2), (r + 3, c + 3)]
-
-    # Check negatively sloped diagonals
-    for c in range(COLUMN_COUNT - 3):
-        for r in range(3, ROW_COUNT):
-            if board[r][c] == piece and board[r - 1][c + 1] == piece and board[r - 2][c + 2] == piece and board[r - 3][c + 3] == piece:
-                return True, [(r, c), (r - 1, c + 1), (r - 2, c + 2), (r - 3, c + 3)]
-
-    return False, []
+            row = board[r]
+            for c in range(COLUMN_COUNT):
+                if row[c] != self.drawn[r][c]:
+                    rect = self.cell_rect(r, c)
+                    self.screen.blit(self.background, rect, rect.move(0, -SQUARESIZE))
+                    if row[c]:
+                        self.screen.blit(self.sprites[row[c]], rect)
+                    self.drawn[r][c] = row[c]
+                    dirty.append(rect)
+        if dirty:
+            pygame.display.update(dirty)
+
+    # Push the header to the display after drawing something other than the scores in it
+    def update_header(self):
+        self.scores = None
+        pygame.display.update(self.header_rect)
+
+    def draw_scores(self, player1_score, player2_score, force=False, status=None):
+        if not force and self.scores == (player1_score, player2_score, status):
+            return
+        self.scores = (player1_score, player2_score, status)
+        if not force:
+            pygame.draw.rect(self.screen, BLACK, self.header_rect)  # Clear the top area
+        self.screen.blit(self.label(f"Player 1: {player1_score}  Player 2: {player2_score}", 30, WHITE), (40, 10))
+        if status:
+            self.screen.blit(self.label(status, 30, YELLOW), (40, 55))
+        pygame.display.update(self.header_rect)
 
 def highlight_winning_move(winning_coords, piece):
     highlight_color = WHITE  # Use white to highlight the winning pieces
+    dirty = []
     for (r, c) in winning_coords:
-        pygame.draw.circle(
+        dirty.append(pygame.draw.circle(
             screen,
             highlight_color,
             (int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)),
             RADIUS + 10,  # Slightly larger radius for highlighting
             5  # Thickness of the highlight circle
-        )
-    pygame.display.update()  # Ensure the screen is updated
+        ))
+    pygame.display.update(dirty)  # Ensure the highlighted cells are updated
+    renderer.invalidate()  # The rings spill into neighbouring cells
 
 def draw_board(board):
-    # Draw the board grid and empty slots
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            pygame.draw.rect(screen, BLUE, (c * SQUARESIZE, r * SQUARESIZE + SQUARESIZE, SQUARESIZE, SQUARESIZE))
-            pygame.draw.circle(screen, BLACK, (int(c * SQUARESIZE + SQUARESIZE / 2), int(r * SQUARESIZE + SQUARESIZE + SQUARESIZE / 2)), RADIUS)
-
-    # Draw the pieces on the board
-    for c in range(COLUMN_COUNT):
-        for r in range(ROW_COUNT):
-            if board[r][c] == 1:
-                pygame.draw.circle(screen, RED, (int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)), RADIUS)
-            elif board[r][c] == 2:
-                pygame.draw.circle(screen, YELLOW, (int(c * SQUARESIZE + SQUARESIZE / 2), height - int(r * SQUARESIZE + SQUARESIZE / 2)), RADIUS)
-
-    pygame.display.update()
+    renderer.draw_board(board)
 
 def play_again():
     global board, game_over, turn
+    ai_worker.cancel()
+    ponderer.stop()
     board = create_board()
+    time_control.reset()
     game_over = False
     turn = 0
     draw_board(board)
-    pygame.display.update()
 
-# Display scores at the top of the screen
-def display_scores(player1_score, player2_score):
-    pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))  # Clear the top area
-    small_font = pygame.font.SysFont("monospace", 30)  # Use a smaller font size
-    score_label = small_font.render(f"Player 1: {player1_score}  Player 2: {player2_score}", 1, WHITE)
-    screen.blit(score_label, (40, 10))  # Adjust position if needed
-    pygame.display.update()
+# Display scores at the top of the screen; redraws only when they changed
+def display_scores(player1_score, player2_score, force=False, status=None):
+    renderer.draw_scores(player1_score, player2_score, force, status)
+
+# Answer already found while pondering
+def known_move(board, result, cancel=None):
+    return result
+
+# Append a finished game to GAME_LOG
+def log_game(board):
+    with RecordWriter(GAME_LOG, append=True) as writer:
+        writer.write(record_from_position(board))
+
+# Stop any AI search and close the window
+def quit_game():
+    ai_worker.shutdown()
+    ponderer.shutdown()
+    pygame.quit()
+    sys.exit()
 
 def choose_game_mode():
     pygame.draw.rect(screen, BLACK, (0, 0, width, height))  # Clear the screen
@@ -112,106 +186,132 @@ def choose_game_mode():
     screen.blit(label2, (40, height // 2))
     pygame.display.update()
 
+    clock = pygame.time.Clock()
     while True:
+        clock.tick(FPS)
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
+                quit_game()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_1:
                     return "PvP"
                 elif event.key == pygame.K_2:
                     return "PvAI"
 
-# Initialize scores
-player1_score = 0
-player2_score = 0
-
-# Main game loop
-while True:  # Main loop to allow replaying the game
-    pygame.init()
-
-    SQUARESIZE = 100
-    width = COLUMN_COUNT * SQUARESIZE
-    height = (ROW_COUNT + 1) * SQUARESIZE
-    size = (width, height)
-    RADIUS = int(SQUARESIZE / 2 - 5)
-
-    # Initialize the screen
-    screen = pygame.display.set_mode(size)
-    pygame.display.set_caption("Connect 4")
-
-    # Choose game mode
-    game_mode = choose_game_mode()
-
-    # Create the board and reset game state
-    board = create_board()
-    print_board(board)
-    game_over = False
-    turn = 0
-
-    # Draw the initial board
-    draw_board(board)
-    pygame.display.update()
-
-    myfont = pygame.font.SysFont("monospace", 75)
-
-    # Display initial scores
-    display_scores(player1_score, player2_score)
-
-    while not game_over:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-
-            # Highlight the column where the player is hovering (PvP only)
-            if event.type == pygame.MOUSEMOTION and game_mode == "PvP":
-                pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
-                posx = event.pos[0]
-                if turn == 0:
-                    pygame.draw.circle(screen, RED, (posx, int(SQUARESIZE / 2)), RADIUS)
-                else:
-                    pygame.draw.circle(screen, YELLOW, (posx, int(SQUARESIZE / 2)), RADIUS)
-                display_scores(player1_score, player2_score)  # Update scores
-                pygame.display.update()
-
-            # Handle mouse click for column selection (PvP)
-            if event.type == pygame.MOUSEBUTTONDOWN and game_mode == "PvP":
-                pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
-                posx = event.pos[0]
-                col = int(math.floor(posx / SQUARESIZE))
-
-                if is_valid_location(board, col):
-                    row = get_next_open_row(board, col)
-                    drop_piece(board, row, col, turn + 1)
-
-                    if winning_move(board, turn + 1)[0]:
-                        winning_coords = winning_move(board, turn + 1)[1]
-                        label = myfont.render(f"Player {turn + 1} wins!!", 1, RED if turn == 0 else YELLOW)
-                        screen.blit(label, (40, 10))
-                        pygame.display.update()
-
-                        draw_board(board)
-                        highlight_winning_move(winning_coords, turn + 1)
-                        pygame.time.wait(5000)
-                        game_over = True
-
-                        if turn == 0:
-                            player1_score += 1
-                        else:
-                            player2_score += 1
-
-                    print_board(board)
-                    draw_board(board)
-
-                    turn += 1
-                    turn = turn % 2
+# Pick the AI's column for the current board; runs on the AI worker thread.
+# The time used is taken from the game budget when charge is set, which it is
+# not while pondering on the player's time.
+def ai_move(board, charge=False, cancel=None):
+    hit = book.lookup(board) if book is not None else None
+    if hit is not None:
+        return hit[0], hit[1]
+    budget_ms = time_control.budget(board)
+    start = time.perf_counter()
+    try:
+        return search_move(board, budget_ms, cancel)
+    finally:
+        if charge:
+            time_control.spend((time.perf_counter() - start) * 1000)
+
+def search_move(board, budget_ms, cancel):
+    if AI_LEVEL == "hard":
+        score, col, exact = solver.best_move(board, budget_ms, cancel)
+        if AI_STATS:
+            print(f"AI solver: nodes={solver.nodes} exact={exact} tt_hit_rate={solver.table.hit_rate():.2f}")
+        return score, col
+    stats = SearchStats() if AI_STATS else None
+    if AI_DEPTH is not None:
+        if stats is None:
+            return minimax(board, AI_DEPTH, -math.inf, math.inf, True, AI_PIECE, table, cancel=cancel, weights=weights,
+                           endgame_cells=ENDGAME_CELLS)
+        with stats:
+            score, col = minimax(board, AI_DEPTH, -math.inf, math.inf, True, AI_PIECE, table, stats=stats, cancel=cancel,
+                                 weights=weights, endgame_cells=ENDGAME_CELLS)
+        print(f"AI search: {stats.log_line()} tt_hit_rate={table.hit_rate():.2f}")
+        return score, col
+    if stats is None:
+        return timed_minimax(board, budget_ms, AI_PIECE, table, cancel=cancel, weights=weights)[:2]
+    with stats:
+        score, col, depth = timed_minimax(board, budget_ms, AI_PIECE, table, stats=stats, cancel=cancel, weights=weights)
+    pv = principal_variation(board, table, AI_PIECE, depth)
+    print(f"AI search: depth={depth} {stats.log_line()} tt_hit_rate={table.hit_rate():.2f} pv={pv}")
+    return score, col
+
+def main():
+    global pygame, screen, renderer, board, game_over, turn
+    global table, weights, time_control, solver, book, ai_worker, ponderer
+    import pygame
+
+    # Initialize scores
+    player1_score = 0
+    player2_score = 0
+
+    # Transposition table kept across moves and games
+    table = TranspositionTable(TABLE_BYTES)
+    weights = load_weights(AI_WEIGHTS) if AI_WEIGHTS else DEFAULT_WEIGHTS
+    time_control = TimeControl(AI_TIME_MS, AI_GAME_MS)
+    solver = Solver(TranspositionTable(TABLE_BYTES))
+    # Opening book answers the first moves without searching, if it has been generated
+    book = load_book()
+    # The AI searches in the background so the window keeps responding
+    ai_worker = AIWorker()
+    ai_started = 0
+    # Pondering shares the AI's tables, so even unplayed replies leave useful entries
+    ponderer = Ponderer(ai_move)
+
+    # Main game loop
+    while True:  # Main loop to allow replaying the game
+        pygame.init()
+
+        # Initialize the screen
+        screen = pygame.display.set_mode(size)
+        pygame.display.set_caption("Connect 4")
+        renderer = Renderer(screen)
+        clock = pygame.time.Clock()
+
+        # Choose game mode
+        game_mode = choose_game_mode()
+        renderer.invalidate()  # The menu covered the whole window
+
+        # Create the board and reset game state
+        board = create_board()
+        time_control.reset()
+        print_board(board)
+        game_over = False
+        turn = 0
+
+        # Draw the initial board
+        pygame.draw.rect(screen, BLACK, renderer.header_rect)
+        draw_board(board)
+
+        myfont = renderer.font(75)
+
+        # Display initial scores
+        display_scores(player1_score, player2_score)
 
-            # Handle keyboard input for column selection (PvP)
-            if event.type == pygame.KEYDOWN and game_mode == "PvP":
-                if pygame.K_1 <= event.key <= pygame.K_7:  # Keys 1 to 7
-                    col = event.key - pygame.K_1  # Map keys 1-7 to columns 0-6
+        while not game_over:
+            clock.tick(FPS)  # Sleep between frames instead of spinning
+            events = pygame.event.get()
+            for event in events:
+                if event.type == pygame.QUIT:
+                    quit_game()
+
+                # Highlight the column where the player is hovering (PvP only)
+                if event.type == pygame.MOUSEMOTION and game_mode == "PvP":
+                    pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
+                    posx = event.pos[0]
+                    if turn == 0:
+                        pygame.draw.circle(screen, RED, (posx, int(SQUARESIZE / 2)), RADIUS)
+                    else:
+                        pygame.draw.circle(screen, YELLOW, (posx, int(SQUARESIZE / 2)), RADIUS)
+                    display_scores(player1_score, player2_score, force=True)  # Scores over the hover piece
+
+                # Handle mouse click for column selection (PvP)
+                if event.type == pygame.MOUSEBUTTONDOWN and game_mode == "PvP":
+                    pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
+                    renderer.update_header()
+                    posx = event.pos[0]
+                    col = int(math.floor(posx / SQUARESIZE))
 
                     if is_valid_location(board, col):
                         row = get_next_open_row(board, col)
@@ -221,7 +321,7 @@ while True:  # Main loop to allow replaying the game
                             winning_coords = winning_move(board, turn + 1)[1]
                             label = myfont.render(f"Player {turn + 1} wins!!", 1, RED if turn == 0 else YELLOW)
                             screen.blit(label, (40, 10))
-                            pygame.display.update()
+                            renderer.update_header()
 
                             draw_board(board)
                             highlight_winning_move(winning_coords, turn + 1)
@@ -239,57 +339,30 @@ while True:  # Main loop to allow replaying the game
                         turn += 1
                         turn = turn % 2
 
-        # AI's turn (PvAI)
-        if game_mode == "PvAI" and turn == 1 and not game_over:
-            pygame.time.wait(1000)  # Add a delay for the AI's move
-            col, minimax_score = minimax(board, 4, -math.inf, math.inf, True)  # Depth = 4
-
-            if is_valid_location(board, col):
-                row = get_next_open_row(board, col)
-                drop_piece(board, row, col, 2)
-
-                if winning_move(board, 2)[0]:
-                    winning_coords = winning_move(board, 2)[1]
-                    label = myfont.render("AI wins!!", 1, YELLOW)
-                    screen.blit(label, (40, 10))
-                    pygame.display.update()
-
-                    draw_board(board)
-                    highlight_winning_move(winning_coords, 2)
-                    pygame.time.wait(5000)
-                    game_over = True
-
-                    player2_score += 1
-
-                print_board(board)
-                draw_board(board)
-
-                turn += 1
-                turn = turn % 2
-
-        # Player's turn in PvAI
-        if game_mode == "PvAI" and turn == 0 and not game_over:
-            for event in pygame.event.get():
-                if event.type == pygame.KEYDOWN:
+                # Handle keyboard input for column selection (PvP)
+                if event.type == pygame.KEYDOWN and game_mode == "PvP":
                     if pygame.K_1 <= event.key <= pygame.K_7:  # Keys 1 to 7
                         col = event.key - pygame.K_1  # Map keys 1-7 to columns 0-6
 
                         if is_valid_location(board, col):
                             row = get_next_open_row(board, col)
-                            drop_piece(board, row, col, 1)
+                            drop_piece(board, row, col, turn + 1)
 
-                            if winning_move(board, 1)[0]:
-                                winning_coords = winning_move(board, 1)[1]
-                                label = myfont.render("Player 1 wins!!", 1, RED)
+                            if winning_move(board, turn + 1)[0]:
+                                winning_coords = winning_move(board, turn + 1)[1]
+                                label = myfont.render(f"Player {turn + 1} wins!!", 1, RED if turn == 0 else YELLOW)
                                 screen.blit(label, (40, 10))
-                                pygame.display.update()
+                                renderer.update_header()
 
                                 draw_board(board)
-                                highlight_winning_move(winning_coords, 1)
+                                highlight_winning_move(winning_coords, turn + 1)
                                 pygame.time.wait(5000)
                                 game_over = True
 
-                                player1_score += 1
+                                if turn == 0:
+                                    player1_score += 1
+                                else:
+                                    player2_score += 1
 
                             print_board(board)
                             draw_board(board)
@@ -297,28 +370,105 @@ while True:  # Main loop to allow replaying the game
                             turn += 1
                             turn = turn % 2
 
-        # Update scores after every event
-        display_scores(player1_score, player2_score)
+            # AI's turn (PvAI)
+            if game_mode == "PvAI" and turn == 1 and not game_over and not ai_worker.busy() and not ai_worker.done():
+                pondered = ponderer.take(board)
+                if pondered is not None:
+                    ai_worker.start(known_move, board, pondered)
+                else:
+                    ai_worker.start(ai_move, board, True)
+                ai_started = pygame.time.get_ticks()
+
+            if game_mode == "PvAI" and turn == 1 and not game_over and ai_worker.done() \
+                    and pygame.time.get_ticks() - ai_started >= AI_MIN_DELAY_MS:
+                minimax_score, col = ai_worker.result()
+
+                if is_valid_location(board, col):
+                    row = get_next_open_row(board, col)
+                    drop_piece(board, row, col, AI_PIECE)
+
+                    if winning_move(board, 2)[0]:
+                        winning_coords = winning_move(board, 2)[1]
+                        label = myfont.render("AI wins!!", 1, YELLOW)
+                        screen.blit(label, (40, 10))
+                        renderer.update_header()
+
+                        draw_board(board)
+                        highlight_winning_move(winning_coords, 2)
+                        pygame.time.wait(5000)
+                        game_over = True
+
+                        player2_score += 1
+
+                    print_board(board)
+                    draw_board(board)
+
+                    turn += 1
+                    turn = turn % 2
 
-        if game_over:
-            pygame.time.wait(3000)
-
-            # Prompt for play again
-            pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
-            play_again_label = myfont.render("Press R to Play Again or Q to Quit", 1, WHITE)
-            screen.blit(play_again_label, (40, 10))
-            pygame.display.update()
-
-            waiting = True
-            while waiting:
-                for event in pygame.event.get():
-                    if event.type == pygame.QUIT:
-                        pygame.quit()
-                        sys.exit()
+            # Player's turn in PvAI
+            if game_mode == "PvAI" and turn == 0 and not game_over:
+                for event in events:
                     if event.type == pygame.KEYDOWN:
-                        if event.key == pygame.K_r:  # Restart the game
-                            play_again()
-                            waiting = False
-                        elif event.key == pygame.K_q:  # Quit the game
-                            pygame.quit()
-                            sys.exit()
\ No newline at end of file
+                        if pygame.K_1 <= event.key <= pygame.K_7:  # Keys 1 to 7
+                            col = event.key - pygame.K_1  # Map keys 1-7 to columns 0-6
+
+                            if is_valid_location(board, col):
+                                row = get_next_open_row(board, col)
+                                drop_piece(board, row, col, 1)
+
+                                if winning_move(board, 1)[0]:
+                                    winning_coords = winning_move(board, 1)[1]
+                                    label = myfont.render("Player 1 wins!!", 1, RED)
+                                    screen.blit(label, (40, 10))
+                                    renderer.update_header()
+
+                                    draw_board(board)
+                                    highlight_winning_move(winning_coords, 1)
+                                    pygame.time.wait(5000)
+                                    game_over = True
+
+                                    player1_score += 1
+
+                                print_board(board)
+                                draw_board(board)
+
+                                turn += 1
+                                turn = turn % 2
+
+            # Think about the AI's replies while the player chooses
+            if AI_PONDER and game_mode == "PvAI" and turn == 0 and not game_over:
+                ponderer.ponder(board)
+            elif game_over:
+                ponderer.stop()
+
+            # Update scores after every event
+            ai_thinking = game_mode == "PvAI" and turn == 1 and not game_over
+            display_scores(player1_score, player2_score, status="AI is thinking..." if ai_thinking else None)
+
+            if game_over:
+                if GAME_LOG:
+                    log_game(board)
+                pygame.time.wait(3000)
+
+                # Prompt for play again
+                pygame.draw.rect(screen, BLACK, (0, 0, width, SQUARESIZE))
+                play_again_label = myfont.render("Press R to Play Again or Q to Quit", 1, WHITE)
+                screen.blit(play_again_label, (40, 10))
+                renderer.update_header()
+
+                waiting = True
+                while waiting:
+                    clock.tick(FPS)
+                    for event in pygame.event.get():
+                        if event.type == pygame.QUIT:
+                            quit_game()
+                        if event.type == pygame.KEYDOWN:
+                            if event.key == pygame.K_r:  # Restart the game
+                                play_again()
+                                waiting = False
+                            elif event.key == pygame.K_q:  # Quit the game
+                                quit_game()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# The bitboard engine and the evaluators against the original NumPy code
+import random
+
+import numpy as np
+
+from connect4_engine import reference
+from connect4_engine.bitboard import PLAYER1, PLAYER2, Position, get_valid_moves, is_tie, winning_move
+from connect4_engine.evaluate import IncrementalEvaluator, score_position
+
+
+# Random games on the standard board, as (board, reference array, last row, last column) after every move
+def random_games(games=60, seed=0):
+    rng = random.Random(seed)
+    for _ in range(games):
+        board = Position()
+        array = np.zeros((reference.ROWS, reference.COLS))
+        while not board.is_full():
+            col = rng.choice(board.valid_moves())
+            row = reference.get_next_open_row(array, col)
+            array[row][col] = board.side
+            board.play(col)
+            yield board, array, row, col
+            if board.last_move_won():
+                break
+
+
+def test_board_matches_reference():
+    for board, array, row, col in random_games():
+        # The reference has row 0 at the top
+        assert (board.to_array() == np.flipud(array)).all()
+        assert get_valid_moves(board) == reference.get_valid_moves(array)
+        assert is_tie(board) == reference.is_tie(array)
+        for piece in (PLAYER1, PLAYER2):
+            assert winning_move(board, piece)[0] == reference.winning_move(array, row, col, piece)
+
+
+def test_score_matches_reference():
+    for board, array, _, _ in random_games(games=20):
+        for piece in (PLAYER1, PLAYER2):
+            assert score_position(board, piece) == reference.score_position(array, piece)
+
+
+def test_incremental_evaluator_follows_play_and_undo():
+    board = Position()
+    evaluator = IncrementalEvaluator(board)
+    rng = random.Random(1)
+    for _ in range(200):
+        if board.moves and (board.is_full() or rng.random() < 0.3):
+            evaluator.undo(board)
+        else:
+            evaluator.play(board, rng.choice(board.valid_moves()))
+        for piece in (PLAYER1, PLAYER2):
+            assert evaluator.score(piece) == score_position(board, piece)
+
+
+def test_undo_restores_the_position():
+    rng = random.Random(2)
+    board = Position()
+    for _ in range(20):
+        board.play(rng.choice(board.valid_moves()))
+    before = board.copy()
+    board.play(rng.choice(board.valid_moves()))
+    board.undo()
+    for name in Position.__slots__:
+        assert getattr(board, name) == getattr(before, name)
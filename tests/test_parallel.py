@@ -0,0 +1,44 @@
+# ParallelSearch returns what serial minimax returns
+import math
+import random
+
+import pytest
+
+from connect4_engine.bitboard import Position, position_from_moves
+from connect4_engine.parallel import ParallelSearch
+from connect4_engine.search import minimax
+from connect4_engine.tt import TranspositionTable
+
+TABLE_BYTES = 1024 * 1024
+
+
+def sample_positions(count=6, seed=3):
+    rng = random.Random(seed)
+    moves = ["", "4", "4453", "25263474"]
+    while len(moves) < count:
+        board = Position()
+        for _ in range(rng.randint(2, 16)):
+            col = rng.choice(board.valid_moves())
+            if board.is_winning_move(col):
+                break
+            board.play(col)
+        moves.append(board.move_string())
+    return moves
+
+
+@pytest.fixture(scope="module")
+def search():
+    with ParallelSearch(2, table_bytes=TABLE_BYTES) as search:
+        yield search
+
+
+@pytest.mark.parametrize("moves", sample_positions())
+def test_parallel_matches_serial(search, moves):
+    for depth in (3, 6):
+        board = position_from_moves(moves)
+        for piece in (board.side, 3 - board.side):
+            expected = minimax(board, depth, -math.inf, math.inf, board.side == piece, piece,
+                               TranspositionTable(TABLE_BYTES))
+            search.table.clear()
+            assert search.search(board, depth, piece) == expected
+            assert board.move_string() == moves
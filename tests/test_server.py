@@ -0,0 +1,59 @@
+# A protocol round trip with the game server over a local socket
+import asyncio
+import json
+
+from connect4_engine.server import MAX_LINE, GameServer
+
+
+async def round_trip():
+    server = GameServer(workers=1)
+    listener = await asyncio.start_server(server.handle, "127.0.0.1", 0, limit=MAX_LINE)
+    port = listener.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    async def send(request):
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        return await receive()
+
+    async def receive():
+        return json.loads(await asyncio.wait_for(reader.readline(), 60))
+
+    try:
+        # A game against the AI, whose spec comes back in its canonical spelling
+        new = await send({"op": "new", "ai": "minimax:02"})
+        assert new["op"] == "new" and new["ai"] == "minimax:2" and new["ai_player"] == 2
+        assert (new["rows"], new["cols"], new["connect"]) == (6, 7, 4)
+        game = new["game"]
+        move = await send({"op": "move", "game": game, "col": 3})
+        assert move == {"op": "move", "game": game, "player": 1, "col": 3, "row": 0, "status": "playing"}
+        answer = await receive()
+        assert answer["op"] == "move" and answer["player"] == 2
+        state = await send({"op": "state", "game": game})
+        assert state["moves"] == [3, answer["col"]] and state["to_move"] == 1
+        assert state["board"][0][3] == 1
+
+        # Bad requests get errors and leave the game unchanged
+        for request in ({"op": "move", "game": game, "col": True}, {"op": "move", "game": game, "col": 7},
+                        {"op": "new", "ai": "minimax:0"}, {"op": "move", "game": 99, "col": 0}, {"op": "bogus"}):
+            assert (await send(request))["op"] == "error"
+        assert (await send({"op": "state", "game": game}))["moves"] == state["moves"]
+        assert (await send({"op": "close", "game": game})) == {"op": "close", "game": game}
+
+        # A game between two clients' moves, won with four in a column
+        game = (await send({"op": "new", "ai": None}))["game"]
+        for col in (0, 1, 0, 1, 0, 1):
+            assert (await send({"op": "move", "game": game, "col": col}))["status"] == "playing"
+        won = await send({"op": "move", "game": game, "col": 0})
+        assert won["status"] == "won" and won["winner"] == 1
+        assert sorted(map(tuple, won["cells"])) == [(0, 0), (1, 0), (2, 0), (3, 0)]
+        assert (await send({"op": "move", "game": game, "col": 1}))["op"] == "error"
+    finally:
+        writer.close()
+        listener.close()
+        await listener.wait_closed()
+        server.close()
+
+
+def test_round_trip():
+    asyncio.run(round_trip())
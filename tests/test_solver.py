@@ -0,0 +1,65 @@
+# The solver against a brute-force search on boards small enough to search fully
+import random
+
+import pytest
+
+from connect4_engine.bitboard import Position, get_variant
+from connect4_engine.solver import Solver, win_score
+
+SMALL_VARIANTS = [get_variant(4, 4, 3), get_variant(3, 5, 3), get_variant(4, 4, 4), get_variant(5, 3, 3)]
+
+
+# Exact score for the player to move by plain negamax over every move, memoized on the position key
+def brute_force(board, memo):
+    key = board.key()
+    if key not in memo:
+        if any(board.is_winning_move(col) for col in board.valid_moves()):
+            memo[key] = win_score(board)
+        elif board.is_full():
+            memo[key] = 0
+        else:
+            best = None
+            for col in board.valid_moves():
+                board.play(col)
+                value = -brute_force(board, memo)
+                board.undo()
+                best = value if best is None else max(best, value)
+            memo[key] = best
+    return memo[key]
+
+
+# The empty board and random unfinished positions of a variant
+def positions(variant, count=15, seed=0):
+    rng = random.Random(seed)
+    yield Position(variant)
+    for _ in range(count):
+        board = Position(variant)
+        for _ in range(rng.randint(1, variant.cells - 2)):
+            col = rng.choice(board.valid_moves())
+            if board.is_winning_move(col):
+                break
+            board.play(col)
+        yield board
+
+
+@pytest.mark.parametrize("variant", SMALL_VARIANTS, ids=lambda v: "%dx%dx%d" % v.dims)
+def test_solver_matches_brute_force(variant):
+    memo = {}
+    solver = Solver()
+    for board in positions(variant):
+        expected = brute_force(board, memo)
+        value, col, exact = solver.best_move(board)
+        assert exact and value == expected, board
+        # The move must keep the value
+        if board.is_winning_move(col):
+            assert value == win_score(board)
+        else:
+            board.play(col)
+            assert -brute_force(board, memo) == value, board
+            board.undo()
+
+
+def test_timed_solver_leaves_the_board_unchanged():
+    board = Position()
+    value, col, exact = Solver().best_move(board, 5)
+    assert board.moves == 0 and board.can_play(col)
@@ -0,0 +1,57 @@
+# Agent and engine specs, and searches to depths that leave nothing to search
+import math
+
+import pytest
+
+from connect4_engine.analysis import make_engine
+from connect4_engine.arena import make_agent, parse_spec
+from connect4_engine.bitboard import STANDARD, Position
+from connect4_engine.search import minimax
+from connect4_engine.server import check_ai
+
+BAD_SPECS = ["minimax:0", "minimax:-1", "minimax:x", "timed:0", "timed:-5", "timed:nan", "timed:inf",
+             "solver:0", "solver:10:weights.json", "random:1", "bogus"]
+
+
+@pytest.mark.parametrize("spec", BAD_SPECS)
+def test_bad_specs_are_rejected(spec):
+    with pytest.raises(ValueError):
+        parse_spec(spec)
+    with pytest.raises(ValueError):
+        make_agent(spec)
+    with pytest.raises(ValueError):
+        check_ai(spec)
+
+
+def test_specs_and_defaults():
+    assert parse_spec("minimax") == ("minimax", 4, "")
+    assert parse_spec("minimax:5:weights.json") == ("minimax", 5, "weights.json")
+    assert parse_spec("solver", time_ms=None) == ("solver", None, "")
+    assert parse_spec("timed:12.5") == ("timed", 12.5, "")
+
+
+def test_server_specs_are_canonical():
+    assert check_ai("minimax:05") == check_ai("minimax: 5") == check_ai("minimax:0_5") == "minimax:5"
+    assert check_ai("solver:1_0_0") == "solver:100"
+    for spec in ("minimax:9", "timed:1e-300", "timed:5000", "minimax:3:weights.json"):
+        with pytest.raises(ValueError):
+            check_ai(spec)
+
+
+def test_analysis_engines():
+    assert make_engine("minimax", STANDARD).depth == 6
+    assert make_engine("solver", STANDARD).time_ms is None
+    for spec in ("minimax:0", "timed:50"):
+        with pytest.raises(ValueError):
+            make_engine(spec, STANDARD)
+
+
+def test_minimax_at_depth_zero_or_below_is_a_leaf():
+    for depth in (0, -1):
+        assert minimax(Position(), depth, -math.inf, math.inf, True)[1] is None
+
+
+def test_agents_choose_legal_moves():
+    board = Position()
+    for spec in ("random", "minimax:1", "timed:5", "solver:5"):
+        assert board.can_play(make_agent(spec, seed=0).choose(board))